@@ -491,10 +491,9 @@ class ModeratorUserViewSet(ReadOnlyModelViewSet):
     def session_detail(self, request, session_id=None):
         """Get detailed information about specific survey session."""
         try:
-            session = SurveySession.objects.select_related(
-                'user', 'survey', 'retake_granted_by'
+            session = SurveySession.with_full_questions().select_related(
+                'retake_granted_by', 'user__position__branch'
             ).prefetch_related(
-                'sessionquestion_set__question__choices',
                 'answers__selected_choices'
             ).get(id=session_id)
         except SurveySession.DoesNotExist:
@@ -510,14 +509,14 @@ class ModeratorUserViewSet(ReadOnlyModelViewSet):
             duration = int(delta.total_seconds() / 60)
         
         # Get session questions with answers
+        answers_by_question_id = {answer.question_id: answer for answer in session.answers.all()}
         questions_data = []
-        for session_question in session.sessionquestion_set.all().order_by('order'):
+        for session_question in session.sessionquestion_set.all():
             question = session_question.question
             
             # Get answer for this question
-            answer_data = None
-            try:
-                answer = session.answers.get(question=question)
+            answer = answers_by_question_id.get(question.id)
+            if answer is not None:
                 answer_data = {
                     'is_correct': answer.is_correct,
                     'text_answer': answer.text_answer,
@@ -533,7 +532,7 @@ class ModeratorUserViewSet(ReadOnlyModelViewSet):
                         for choice in answer.selected_choices.all()
                     ]
                 }
-            except:
+            else:
                 answer_data = {
                     'is_correct': None,
                     'text_answer': '',
@@ -1,3 +1,5 @@
+import copy
+
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
 from drf_spectacular.utils import extend_schema_serializer, OpenApiExample
@@ -8,6 +10,28 @@ from apps.surveys.models import (
 )
 
 
+class CachedFieldsMixin:
+    """
+    Build serializer fields once per class and reuse them.
+    
+    ModelSerializer.get_fields() introspects the model on every instantiation.
+    The result is cached per class and copied for each instance; nested
+    serializers are deep-copied so each instance binds its own context.
+    """
+    
+    _fields_cache = {}
+    
+    def get_fields(self):
+        cls = self.__class__
+        fields = CachedFieldsMixin._fields_cache.get(cls)
+        if fields is None:
+            fields = CachedFieldsMixin._fields_cache[cls] = super().get_fields()
+        return {
+            name: copy.deepcopy(field) if isinstance(field, serializers.BaseSerializer) else copy.copy(field)
+            for name, field in fields.items()
+        }
+
+
 @extend_schema_serializer(
     examples=[
         OpenApiExample(
@@ -23,7 +47,7 @@ from apps.surveys.models import (
         )
     ]
 )
-class ChoiceSerializer(serializers.ModelSerializer):
+class ChoiceSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for question choices."""
     
     text = serializers.SerializerMethodField(help_text="Текст варианта ответа")
@@ -88,7 +112,7 @@ class ChoiceSerializer(serializers.ModelSerializer):
         )
     ]
 )
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for survey questions."""
     
     text = serializers.SerializerMethodField(help_text="Текст вопроса")
@@ -251,7 +275,7 @@ class StartSurveySerializer(serializers.Serializer):
         return attrs
 
 
-class SessionQuestionSerializer(serializers.ModelSerializer):
+class SessionQuestionSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for session questions."""
     
     question = QuestionSerializer(read_only=True)
@@ -261,7 +285,7 @@ class SessionQuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'question', 'order', 'is_answered', 'points_earned']
 
 
-class SurveySessionSerializer(serializers.ModelSerializer):
+class SurveySessionSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for survey sessions."""
     
     survey = SurveyDetailSerializer(read_only=True)
@@ -407,7 +431,7 @@ class SubmitAnswerSerializer(serializers.Serializer):
         return attrs
 
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for answers."""
     
     selected_choices = ChoiceSerializer(many=True, read_only=True)
@@ -455,7 +479,8 @@ class CertificateDataSerializer(serializers.ModelSerializer):
     user_employee_level = serializers.CharField(source='user.get_employee_level_display', read_only=True)
     survey_title = serializers.CharField(source='survey.title', read_only=True)
     survey_description = serializers.CharField(source='survey.description', read_only=True)
-    duration_minutes = serializers.SerializerMethodField()
+    # Annotated on the queryset by the certificate views
+    duration_minutes = serializers.IntegerField(source='duration_in_minutes', read_only=True)
     
     class Meta:
         model = SurveySession
@@ -473,10 +498,6 @@ class CertificateDataSerializer(serializers.ModelSerializer):
             'started_at', 'completed_at', 'duration_minutes',
             'language'
         ]
-    
-    def get_duration_minutes(self, obj):
-        """Calculate duration in minutes."""
-        return obj.duration_minutes()
 
 
 class FaceVerificationSerializer(serializers.ModelSerializer):
@@ -7,12 +7,24 @@ from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, IntegerField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, Extract, Floor
 from django.views import View
-from django.http import HttpResponse
+from django.http import (
+    FileResponse, Http404, HttpResponseNotFound, JsonResponse, StreamingHttpResponse
+)
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.template.loader import render_to_string
+import json
 import requests
 import mimetypes
 import os
+import tempfile
 from drf_spectacular.utils import (
     extend_schema, extend_schema_view, OpenApiParameter, OpenApiExample
 )
@@ -20,9 +32,16 @@ from drf_spectacular.types import OpenApiTypes
 
 from apps.surveys.models import (
     Survey, SurveySession, SessionQuestion, Answer, UserSurveyHistory,
-    FaceVerification, SessionRecording, ProctorReview, VideoChunk
+    SessionRecording, ProctorReview, VideoChunk
+)
+from apps.surveys import heartbeat_buffer
+from apps.surveys.gotenberg_client import (
+    GotenbergUnavailable, convert_url_to_pdf, get_certificate_url, iter_pdf_chunks
 )
-from apps.surveys.tasks import create_hls_playlist, transcode_chunk_to_ts
+from apps.surveys.tasks import (
+    certificate_pdf_path, create_hls_playlist, generate_certificate_pdf, transcode_chunk_to_ts
+)
+from .renderers import ORJSONRenderer
 from .serializers import (
     SurveyListSerializer, SurveyDetailSerializer, StartSurveySerializer,
     SurveySessionSerializer, SubmitAnswerSerializer, AnswerSerializer,
@@ -362,10 +381,22 @@ class SurveySessionViewSet(GenericViewSet):
     
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = SurveySessionSerializer
+    # Moderation columns that the respondent-facing actions never read
+    deferred_fields = ('face_reference_image', 'retake_reason', 'retake_granted_by', 'approved_by', 'approved_at')
     
     def get_queryset(self):
         """Get user's survey sessions."""
-        return SurveySession.objects.filter(user=self.request.user).order_by('-started_at')
+        return SurveySession.objects.filter(
+            user=self.request.user
+        ).select_related('survey').defer(*self.deferred_fields).order_by('-started_at')
+    
+    def get_session(self, pk):
+        """Get user's session by id, fetching it at most once per request."""
+        session = getattr(self, '_session', None)
+        if session is None or str(session.pk) != str(pk):
+            session = get_object_or_404(self.get_queryset(), pk=pk)
+            self._session = session
+        return session
     
     def list(self, request):
         """Get all user's survey sessions."""
@@ -375,7 +406,7 @@ class SurveySessionViewSet(GenericViewSet):
     
     def retrieve(self, request, pk=None):
         """Get session details."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         
         # Check if session is expired
         if session.is_expired() and session.status not in ['completed', 'cancelled']:
@@ -471,7 +502,7 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['post'])
     def submit_answer(self, request, pk=None):
         """Submit an answer for a question."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         
         serializer = SubmitAnswerSerializer(
             data={
@@ -519,7 +550,7 @@ class SurveySessionViewSet(GenericViewSet):
                 # Update session question
                 session_question.is_answered = True
                 session_question.points_earned = points_earned
-                session_question.save()
+                session_question.save(update_fields=['is_answered', 'points_earned'])
                 
                 # Check if user wants to force finish or all questions are answered
                 force_finish = validated_data.get('force_finish', False)
@@ -605,7 +636,7 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel active session."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         
         if session.status not in ['started', 'in_progress']:
             return Response(
@@ -666,7 +697,7 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['post'])
     def finish(self, request, pk=None):
         """Finish survey session and calculate final results."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         
         # Check if session can be finished
         if session.status not in ['started', 'in_progress']:
@@ -755,7 +786,7 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['get'])
     def progress(self, request, pk=None):
         """Get session progress and answered questions."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         
         progress = session.get_current_progress()
         
@@ -834,67 +865,58 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['get'])
     def get_question(self, request, pk=None):
         """Get specific question by order number."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
-        order = request.query_params.get('order')
-        
-        if not order:
-            return Response(
-                {'error': _('Order parameter is required')},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            order = int(order)
-        except ValueError:
-            return Response(
-                {'error': _('Invalid order parameter')},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        session_question = session.get_question_by_order(order)
-        if not session_question:
+        session = self.get_session(pk)
+        order, error_response = self._get_order_param(
+            request, 'order',
+            _('Order parameter is required'), _('Invalid order parameter')
+        )
+        if error_response:
+            return error_response
+        
+        # One ordered query gives both the requested question and its neighbours
+        session_questions = list(session.sessionquestion_set.select_related('question').order_by('order'))
+        index = next(
+            (i for i, session_question in enumerate(session_questions) if session_question.order == order),
+            None
+        )
+        if index is None:
             return Response(
                 {'error': _('Question not found')},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get navigation info
-        previous_question = session.get_previous_question(order)
-        next_question = session.get_next_question(order)
-        
-        # Get answer if exists
-        try:
-            answer = session.answers.get(question=session_question.question)
-            answer_data = AnswerSerializer(answer).data
-        except Answer.DoesNotExist:
-            answer_data = None
-        
-        # Serialize question with language context
-        question_data = SessionQuestionSerializer(
-            session_question, 
-            context={'language': session.language}
-        ).data
+        session_question = session_questions[index]
         
+        # Get navigation info
+        has_previous = index > 0
+        has_next = index + 1 < len(session_questions)
         navigation_data = {
-            'has_previous': previous_question is not None,
-            'has_next': next_question is not None,
-            'previous_order': previous_question.order if previous_question else None,
-            'next_order': next_question.order if next_question else None
+            'has_previous': has_previous,
+            'has_next': has_next,
+            'previous_order': session_questions[index - 1].order if has_previous else None,
+            'next_order': session_questions[index + 1].order if has_next else None
         }
         
-        return Response({
-            'question': question_data,
-            'navigation': navigation_data,
-            'answer': answer_data
-        })
+        return self._question_response(session, session_question, navigation=navigation_data)
     
     @extend_schema(
         summary="Обновить ответ",
         description="""Обновить уже данный ответ на вопрос.
         
         Доступно только для активных сессий и отвеченных вопросов.
-        Альтернативно можно использовать submit_answer для обновления ответов.""",
+        Альтернативно можно использовать submit_answer для обновления ответов.
+        По умолчанию возвращает только итоги сессии; полная сессия — с параметром include=session.""",
         tags=["Сессии"],
+        parameters=[
+            OpenApiParameter(
+                name='include',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Передайте "session", чтобы получить полную сессию в ответе',
+                enum=['session'],
+                required=False
+            )
+        ],
         request={
             "type": "object",
             "properties": {
@@ -910,7 +932,10 @@ class SurveySessionViewSet(GenericViewSet):
                 "properties": {
                     "message": {"type": "string"},
                     "answer": {"type": "object"},
-                    "session": {"type": "object"}
+                    "session": {
+                        "type": "object",
+                        "description": "Итоги сессии (id, score, answered_count, progress) или полная сессия при include=session"
+                    }
                 }
             },
             400: {
@@ -924,7 +949,7 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['post'])
     def modify_answer(self, request, pk=None):
         """Modify existing answer for a question."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         question_id = request.data.get('question_id')
         
         if not question_id:
@@ -949,28 +974,46 @@ class SurveySessionViewSet(GenericViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update answer
-        if 'choice_ids' in request.data:
-            answer.selected_choices.clear()
-            if request.data['choice_ids']:
-                answer.selected_choices.set(request.data['choice_ids'])
-        
-        if 'text_answer' in request.data:
-            answer.text_answer = request.data['text_answer']
-        
-        # Recalculate score
-        points_earned = answer.calculate_score()
-        answer.save()
+        with transaction.atomic():
+            # Update answer
+            if 'choice_ids' in request.data:
+                answer.selected_choices.set(request.data['choice_ids'] or [])
+            
+            if 'text_answer' in request.data:
+                answer.text_answer = request.data['text_answer']
+            
+            # Recalculate score
+            points_earned = answer.calculate_score()
+            answer.save(update_fields=['text_answer', 'is_correct', 'points_earned'])
+            
+            # Update session question without loading it
+            session.sessionquestion_set.filter(question_id=question_id).update(
+                points_earned=points_earned
+            )
         
-        # Update session question
-        session_question = session.sessionquestion_set.get(question_id=question_id)
-        session_question.points_earned = points_earned
-        session_question.save()
+        # Return only the totals affected by this change unless the client
+        # explicitly asks for the full session (?include=session)
+        if request.query_params.get('include') == 'session':
+            session_data = SurveySessionSerializer(session, context={'request': request}).data
+        else:
+            totals = session.sessionquestion_set.aggregate(
+                total_questions=Count('id'),
+                answered_questions=Count('id', filter=Q(is_answered=True)),
+                points_earned=Coalesce(Sum('points_earned'), 0)
+            )
+            total_questions = totals['total_questions']
+            answered_questions = totals['answered_questions']
+            session_data = {
+                'id': str(session.id),
+                'score': totals['points_earned'],
+                'answered_count': answered_questions,
+                'progress': (answered_questions / total_questions * 100) if total_questions > 0 else 0
+            }
         
         return Response({
             'message': _('Answer updated successfully'),
             'answer': AnswerSerializer(answer).data,
-            'session': SurveySessionSerializer(session, context={'request': request}).data
+            'session': session_data
         })
     
     @extend_schema(
@@ -1005,48 +1048,51 @@ class SurveySessionViewSet(GenericViewSet):
             }
         }
     )
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], renderer_classes=[ORJSONRenderer])
     def all_answers(self, request, pk=None):
         """Get all questions with user answers for the session."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
+        session = self.get_session(pk)
         
         # Get all session questions with answers
-        session_questions = session.sessionquestion_set.select_related('question').prefetch_related(
-            'question__choices'
-        ).order_by('order')
-        
-        questions_data = []
-        total_points = 0
-        max_total_points = 0
-        
-        for session_question in session_questions:
-            # Get answer if exists
-            try:
-                answer = session.answers.get(question=session_question.question)
-                answer_data = AnswerSerializer(answer).data
-            except Answer.DoesNotExist:
-                answer_data = None
-            
-            # Serialize question with language context
-            question_data = SessionQuestionSerializer(
-                session_question, 
-                context={'language': session.language}
-            ).data
-            
-            questions_data.append({
+        session_questions = list(
+            session.sessionquestion_set.select_related('question').prefetch_related(
+                'question__choices'
+            ).order_by('order')
+        )
+
+        # Serialize all answers and questions in one pass each, so the
+        # serializer fields are bound once instead of once per row
+        answers_data = AnswerSerializer(
+            session.answers.prefetch_related('selected_choices'),
+            many=True
+        ).data
+        answers_by_question_id = {answer['question']: answer for answer in answers_data}
+
+        questions_serialized = SessionQuestionSerializer(
+            session_questions,
+            many=True,
+            context={'language': session.language}
+        ).data
+
+        questions_data = [
+            {
                 'question': question_data,
-                'answer': answer_data,
+                'answer': answers_by_question_id.get(session_question.question_id),
                 'points_earned': session_question.points_earned or 0,
                 'max_points': session_question.question.points or 0
-            })
-            
-            total_points += session_question.points_earned or 0
-            max_total_points += session_question.question.points or 0
+            }
+            for session_question, question_data in zip(session_questions, questions_serialized)
+        ]
+
+        totals = session.sessionquestion_set.aggregate(
+            total_points=Coalesce(Sum('points_earned'), 0),
+            max_total_points=Coalesce(Sum('question__points'), 0)
+        )
         
         return Response({
             'questions': questions_data,
-            'total_points': total_points,
-            'max_total_points': max_total_points
+            'total_points': totals['total_points'],
+            'max_total_points': totals['max_total_points']
         })
     
     @extend_schema(
@@ -1087,22 +1133,13 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['get'])
     def next_question_by_order(self, request, pk=None):
         """Get next question in the session by order."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
-        current_order = request.query_params.get('current_order')
-        
-        if not current_order:
-            return Response(
-                {'error': _('Current order parameter is required')},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            current_order = int(current_order)
-        except ValueError:
-            return Response(
-                {'error': _('Invalid current order parameter')},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        session = self.get_session(pk)
+        current_order, error_response = self._get_order_param(
+            request, 'current_order',
+            _('Current order parameter is required'), _('Invalid current order parameter')
+        )
+        if error_response:
+            return error_response
         
         next_question = session.get_next_question(current_order)
         if not next_question:
@@ -1111,23 +1148,7 @@ class SurveySessionViewSet(GenericViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get answer if exists
-        try:
-            answer = session.answers.get(question=next_question.question)
-            answer_data = AnswerSerializer(answer).data
-        except Answer.DoesNotExist:
-            answer_data = None
-        
-        # Serialize question with language context
-        question_data = SessionQuestionSerializer(
-            next_question, 
-            context={'language': session.language}
-        ).data
-        
-        return Response({
-            'question': question_data,
-            'answer': answer_data
-        })
+        return self._question_response(session, next_question)
     
     @extend_schema(
         summary="Предыдущий вопрос",
@@ -1167,22 +1188,13 @@ class SurveySessionViewSet(GenericViewSet):
     @action(detail=True, methods=['get'])
     def previous_question(self, request, pk=None):
         """Get previous question in the session."""
-        session = get_object_or_404(self.get_queryset(), pk=pk)
-        current_order = request.query_params.get('current_order')
-        
-        if not current_order:
-            return Response(
-                {'error': _('Current order parameter is required')},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            current_order = int(current_order)
-        except ValueError:
-            return Response(
-                {'error': _('Invalid current order parameter')},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        session = self.get_session(pk)
+        current_order, error_response = self._get_order_param(
+            request, 'current_order',
+            _('Current order parameter is required'), _('Invalid current order parameter')
+        )
+        if error_response:
+            return error_response
         
         previous_question = session.get_previous_question(current_order)
         if not previous_question:
@@ -1191,25 +1203,41 @@ class SurveySessionViewSet(GenericViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get answer if exists
-        try:
-            answer = session.answers.get(question=previous_question.question)
-            answer_data = AnswerSerializer(answer).data
-        except Answer.DoesNotExist:
-            answer_data = None
+        return self._question_response(session, previous_question)
+    
+    def _get_order_param(self, request, name, required_message, invalid_message):
+        """Parse an integer order query parameter, returning (order, error_response)."""
+        value = request.query_params.get(name)
+        
+        if not value:
+            return None, Response(
+                {'error': required_message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Serialize question with language context
+        try:
+            return int(value), None
+        except ValueError:
+            return None, Response(
+                {'error': invalid_message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    def _question_response(self, session, session_question, **extra):
+        """Build the response for a single session question and the user's answer."""
         question_data = SessionQuestionSerializer(
-            previous_question, 
+            session_question,
             context={'language': session.language}
         ).data
         
+        answer = session.answers.filter(question_id=session_question.question_id).first()
+        
         return Response({
             'question': question_data,
-            'answer': answer_data
+            **extra,
+            'answer': AnswerSerializer(answer).data if answer else None
         })
 
-
 @extend_schema(
     summary="Текущая активная сессия",
     description="""Получить информацию о текущей активной сессии пользователя.
@@ -1237,35 +1265,99 @@ class CurrentSessionView(APIView):
     
     permission_classes = [permissions.IsAuthenticated]
     
+    # Seconds to keep the serialized session; the cache is also cleared
+    # whenever the user's sessions or session questions are saved
+    cache_timeout = 30
+    
     def get(self, request):
         """Get current active session if any."""
+        cache_key = SurveySession.current_session_cache_key(request.user.id)
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return Response(payload)
+        
         active_session = SurveySession.objects.filter(
             user=request.user,
             status__in=['started', 'in_progress']
         ).select_related('survey').first()
         
+        timeout = self.cache_timeout
+        payload = {'session': None}
+        
         if active_session:
             # Check if expired
             if active_session.is_expired():
                 active_session.status = 'expired'
                 active_session.save()
-                return Response({'session': None})
-            
-            serializer = SurveySessionSerializer(active_session, context={'request': request})
-            return Response({'session': serializer.data})
-        
-        return Response({'session': None})
+            else:
+                serializer = SurveySessionSerializer(active_session, context={'request': request})
+                payload = {'session': serializer.data}
+                # Never serve the session from cache past its expiry
+                seconds_left = int((active_session.expires_at - timezone.now()).total_seconds())
+                timeout = max(1, min(timeout, seconds_left))
+        
+        cache.set(cache_key, payload, timeout)
+        return Response(payload)
 
 
 from django.views import View
 from django.http import HttpResponse
 import requests
-import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Rendered certificates only change when a session is re-completed
+CERTIFICATE_PDF_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _certificate_pdf_cache_key(session):
+    """Cache key for the storage path of a session's rendered certificate PDF."""
+    completed = int(session.completed_at.timestamp()) if session.completed_at else 0
+    return f"cert_pdf_path:{session.id}:{completed}"
+
+
+def _certificate_content_disposition(session):
+    """Attachment header with an RFC 5987 encoded certificate filename."""
+    # Collapse whitespace so names with newlines cannot break the header
+    filename = ' '.join(f"certificate_{session.user.name}_{session.survey.title}.pdf".split())
+    return content_disposition_header(as_attachment=True, filename=filename)
+
+
+def _rendered_certificate_response(session, cache_key):
+    """Serve an already rendered certificate from storage, if any."""
+    # The cache remembers where rendered PDFs are stored, which spares the
+    # storage lookup; PDFs rendered by generate_certificate_pdf are found
+    # at their versioned path
+    pdf_path = cache.get(cache_key)
+    if pdf_path is None:
+        pdf_path = certificate_pdf_path(session.id, session.completed_at)
+        if not default_storage.exists(pdf_path):
+            return None
+        cache.set(cache_key, pdf_path, timeout=CERTIFICATE_PDF_CACHE_TIMEOUT)
+    
+    return FileResponse(default_storage.open(pdf_path, 'rb'), content_type="application/pdf")
+
+
+def _stream_and_store_pdf(response, session, cache_key):
+    """
+    Stream a Gotenberg PDF to the client and store it once fully sent.
+    
+    Chunks are spooled to a temporary file on disk as they pass through, so
+    memory stays at one chunk per download whatever the PDF size.
+    """
+    with tempfile.TemporaryFile() as spool:
+        for chunk in iter_pdf_chunks(response):
+            spool.write(chunk)
+            yield chunk
+        spool.seek(0)
+        pdf_path = default_storage.save(
+            certificate_pdf_path(session.id, session.completed_at), File(spool)
+        )
+    cache.set(cache_key, pdf_path, timeout=CERTIFICATE_PDF_CACHE_TIMEOUT)
+
+
 class DownloadCertificatePDFView(View):
     """Download PDF certificate from HTML page using Gotenberg."""
     
@@ -1273,120 +1365,240 @@ class DownloadCertificatePDFView(View):
         """Generate and download PDF certificate for survey session."""
         from apps.surveys.models import SurveySession
         
+        # Reject anonymous requests before touching the database
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        
         try:
-            # Get session with related data
+            # Get session with only the columns needed for the response
             session = SurveySession.objects.select_related(
                 'user', 'survey'
+            ).only(
+                'id', 'status', 'completed_at', 'user__id', 'user__name', 'survey__id', 'survey__title'
             ).get(id=session_id)
         except SurveySession.DoesNotExist:
-            return HttpResponse(
-                '{"error": "Session not found"}', 
-                content_type="application/json", 
-                status=404
-            )
+            return JsonResponse({'error': 'Session not found'}, status=404)
         
         # Check permissions - user can only access their own certificates
         # or moderators can access any certificate
-        if not request.user.is_authenticated:
-            return HttpResponse(
-                '{"error": "Authentication required"}', 
-                content_type="application/json", 
-                status=401
-            )
-        
-        if not (request.user == session.user or request.user.is_moderator):
-            return HttpResponse(
-                '{"error": "Access denied"}', 
-                content_type="application/json", 
-                status=403
-            )
+        if not (request.user.is_moderator or request.user.id == session.user_id):
+            return JsonResponse({'error': 'Access denied'}, status=403)
         
         # Check if session is completed
         if session.status != 'completed':
-            return HttpResponse(
-                '{"error": "Certificate can only be generated for completed sessions"}', 
-                content_type="application/json", 
-                status=400
-            )
+            return JsonResponse({'error': 'Certificate can only be generated for completed sessions'}, status=400)
         
-        # Construct certificate URL - используем базовый URL из настроек или дефолтный
-        from django.conf import settings
-        base_url = getattr(settings, 'CERTIFICATE_BASE_URL', 'https://savollar.leetcode.uz')
-        if not base_url.endswith('/'):
-            base_url += '/'
-        
-        certificate_url = f"{base_url}certificate/{session_id}"
-        
-        # Prepare data for Gotenberg
-        gotenberg_url = "http://gotenberg:3000/forms/chromium/convert/url"
-        
-        # Options for PDF generation - using multipart/form-data
-        # Need at least one file to trigger multipart/form-data content type
-        files = {"dummy": ("", "", "text/plain")}
-        data = {
-            "url": certificate_url,
-            "marginTop": "0",
-            "marginBottom": "0", 
-            "marginLeft": "0",
-            "marginRight": "0",
-            "format": "A4",
-            "landscape": "true",
-            "waitTimeout": "10s",
-            "waitForSelector": "body",
-        }
+        certificate_url = get_certificate_url(session_id)
+        
+        # Completed sessions never change, so the rendered PDF can be reused
+        cache_key = _certificate_pdf_cache_key(session)
         
         try:
-            # Give the certificate page time to fully render on the frontend
-            time.sleep(4)
-            logger.info(f"Converting certificate to PDF: {certificate_url}")
-            
-            # Send request to Gotenberg with multipart/form-data
-            response = requests.post(
-                gotenberg_url, 
-                data=data,
-                files=files,
-                timeout=60
-            )
-            response.raise_for_status()
-            
-            # Get PDF content from Gotenberg response
-            pdf_content = response.content
+            http_response = _rendered_certificate_response(session, cache_key)
+            if http_response is None:
+                # Stream the PDF through instead of buffering the whole body
+                response = convert_url_to_pdf(certificate_url, stream=True)
+                http_response = StreamingHttpResponse(
+                    _stream_and_store_pdf(response, session, cache_key),
+                    content_type="application/pdf"
+                )
             
             # Return PDF file for download
-            http_response = HttpResponse(pdf_content, content_type="application/pdf")
-            http_response["Content-Disposition"] = f'attachment; filename="certificate_{session.user.name}_{session.survey.title}.pdf"'
+            http_response["Content-Disposition"] = _certificate_content_disposition(session)
             return http_response
             
+        except GotenbergUnavailable:
+            return JsonResponse({'error': 'PDF service is temporarily unavailable'}, status=503)
         except requests.exceptions.Timeout:
             logger.error(f"Timeout when converting certificate to PDF: {certificate_url}")
-            return HttpResponse(
-                '{"error": "Timeout: Certificate page took too long to load"}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': 'Timeout: Certificate page took too long to load'}, status=500)
         except requests.exceptions.ConnectionError:
             logger.error("Connection error when connecting to Gotenberg")
-            return HttpResponse(
-                '{"error": "Error generating PDF: Cannot connect to PDF service"}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': 'Error generating PDF: Cannot connect to PDF service'}, status=500)
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error when converting certificate to PDF: {str(e)}")
-            return HttpResponse(
-                f'{{"error": "Error generating PDF: {str(e)}"}}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': f'Error generating PDF: {e}'}, status=500)
         except Exception as e:
             logger.error(f"Unexpected error when converting certificate to PDF: {str(e)}")
-            return HttpResponse(
-                f'{{"error": "Unexpected error: {str(e)}"}}', 
-                content_type="application/json", 
-                status=500
+            return JsonResponse({'error': f'Unexpected error: {e}'}, status=500)
+
+
+@extend_schema(
+    summary="Запустить генерацию PDF сертификата",
+    description="""Поставить генерацию PDF сертификата в очередь.
+    
+    Возвращает ID задачи и URL, по которому можно проверить готовность PDF.""",
+    tags=["Сертификаты"],
+    responses={
+        202: {
+            "type": "object",
+            "properties": {
+                "task_id": {"type": "string"},
+                "status_url": {"type": "string"}
+            }
+        },
+        400: {
+            "type": "object",
+            "properties": {
+                "error": {"type": "string", "example": "Certificate can only be generated for completed sessions"}
+            }
+        }
+    }
+)
+class GenerateCertificatePDFView(APIView):
+    """Queue PDF certificate generation for a completed survey session."""
+    
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, session_id, *args, **kwargs):
+        """Enqueue PDF generation and return the task ID."""
+        session = get_object_or_404(
+            SurveySession.objects.select_related('user'),
+            id=session_id
+        )
+        
+        if not (request.user == session.user or request.user.is_moderator):
+            return Response(
+                {'error': _('Access denied')},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if session.status != 'completed':
+            return Response(
+                {'error': _('Certificate can only be generated for completed sessions')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        task = generate_certificate_pdf.delay(str(session.id))
+        
+        return Response({
+            'task_id': task.id,
+            'status_url': reverse('api:surveys:certificate-job', kwargs={'task_id': task.id})
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(
+    summary="Запустить генерацию PDF сертификата пользователя",
+    description="""Поставить в очередь генерацию PDF сертификата для сессии пользователя с наивысшим баллом.
+    
+    Возвращает ID задачи и URL, по которому можно проверить готовность PDF.""",
+    tags=["Сертификаты"],
+    responses={
+        202: {
+            "type": "object",
+            "properties": {
+                "task_id": {"type": "string"},
+                "status_url": {"type": "string"}
+            }
+        },
+        404: {
+            "type": "object",
+            "properties": {
+                "error": {"type": "string", "example": "No completed sessions found for this user"}
+            }
+        }
+    }
+)
+class GenerateUserCertificatePDFView(APIView):
+    """Queue PDF certificate generation for user's best session."""
+    
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request, user_uuid, *args, **kwargs):
+        """Enqueue PDF generation and return the task ID."""
+        session_id = SurveySession.objects.filter(
+            user_id=user_uuid,
+            score__isnull=False  # Only sessions with scores
+        ).order_by('-score', '-completed_at').values_list('id', flat=True).first()
+        
+        if not session_id:
+            return Response(
+                {'error': _('No completed sessions found for this user')},
+                status=status.HTTP_404_NOT_FOUND
             )
+        
+        task = generate_certificate_pdf.delay(str(session_id))
+        
+        return Response({
+            'task_id': task.id,
+            'status_url': reverse('api:surveys:certificate-job', kwargs={'task_id': task.id})
+        }, status=status.HTTP_202_ACCEPTED)
 
 
+@extend_schema(
+    summary="Статус генерации PDF сертификата",
+    description="""Проверить статус задачи генерации PDF сертификата.
+    
+    Пока PDF генерируется, возвращает 202. Когда PDF готов, перенаправляет на файл.""",
+    tags=["Сертификаты"],
+    responses={
+        202: {
+            "type": "object",
+            "properties": {
+                "status": {"type": "string", "example": "pending"}
+            }
+        },
+        302: {"description": "Перенаправление на PDF файл"},
+        500: {
+            "type": "object",
+            "properties": {
+                "error": {"type": "string", "example": "Error generating PDF"}
+            }
+        }
+    }
+)
+class CertificatePDFJobView(APIView):
+    """Poll a PDF certificate generation task and redirect to the file when ready."""
+    
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, task_id, *args, **kwargs):
+        """Return task status or redirect to the generated PDF."""
+        result = generate_certificate_pdf.AsyncResult(task_id)
+        
+        if not result.ready():
+            return Response(
+                {'status': result.state.lower()},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        payload = result.result if result.successful() else None
+        if not payload or payload.get('status') == 'error':
+            message = payload.get('message') if payload else 'Error generating PDF'
+            return Response(
+                {'error': message},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return redirect(default_storage.url(payload['path']))
+
+
+# Columns read by CertificateDataSerializer, so certificate queries skip the
+# rest of the session, user and survey rows
+CERTIFICATE_RELATED_FIELDS = ('user__position__branch', 'survey')
+CERTIFICATE_FIELDS = (
+    'id', 'status', 'certificate_order', 'attempt_number', 'language',
+    'score', 'total_points', 'percentage', 'is_passed', 'started_at', 'completed_at',
+    'user', 'user__name', 'user__work_domain', 'user__employee_level',
+    'user__position', 'user__position__name_uz', 'user__position__name_uz_cyrl',
+    'user__position__name_ru', 'user__position__branch',
+    'user__position__branch__name_uz', 'user__position__branch__name_uz_cyrl',
+    'user__position__branch__name_ru',
+    'survey', 'survey__title', 'survey__description',
+)
+# Whole minutes between start and completion, computed by PostgreSQL
+CERTIFICATE_ANNOTATIONS = {
+    'duration_in_minutes': Cast(
+        Floor(
+            Extract(
+                ExpressionWrapper(F('completed_at') - F('started_at'), output_field=DurationField()),
+                'epoch'
+            ) / 60
+        ),
+        IntegerField()
+    ),
+}
+
 @extend_schema(
     summary="Получить данные сертификата",
     description="""Получить данные сертификата для завершенной сессии опроса.
@@ -1465,14 +1677,15 @@ class GetCertificateDataView(APIView):
     """Get certificate data for completed survey session."""
     
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [ORJSONRenderer]
     
     def get(self, request, session_id, *args, **kwargs):
         """Get certificate data for survey session."""
         try:
             # Get session with related data
             session = SurveySession.objects.select_related(
-                'user', 'survey'
-            ).get(id=session_id)
+                *CERTIFICATE_RELATED_FIELDS
+            ).only(*CERTIFICATE_FIELDS).annotate(**CERTIFICATE_ANNOTATIONS).get(id=session_id)
         except SurveySession.DoesNotExist:
             return Response(
                 {'error': _('Session not found')}, 
@@ -1508,9 +1721,9 @@ class GetCertificateDataView(APIView):
     parameters=[
         OpenApiParameter(
             name='user_uuid',
-            type=OpenApiTypes.STR,
+            type=OpenApiTypes.INT,
             location=OpenApiParameter.PATH,
-            description='UUID пользователя',
+            description='ID пользователя',
             required=True
         )
     ],
@@ -1563,6 +1776,7 @@ class GetCertificateDataView(APIView):
 class GetUserCertificateDataView(APIView):
     """Get certificate data for user by UUID - returns session with highest score."""
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [ORJSONRenderer]
 
     def get(self, request, user_uuid, *args, **kwargs):
         """Get certificate data for user's best session."""
@@ -1581,6 +1795,10 @@ class GetUserCertificateDataView(APIView):
         session = SurveySession.objects.filter(
             user=user,
             score__isnull=False  # Only sessions with scores
+        ).select_related(
+            *CERTIFICATE_RELATED_FIELDS
+        ).only(*CERTIFICATE_FIELDS).annotate(
+            **CERTIFICATE_ANNOTATIONS
         ).order_by('-score', '-completed_at').first()
         
         if not session:
@@ -1594,6 +1812,10 @@ class GetUserCertificateDataView(APIView):
         return Response(serializer.data)
 
 
+# Static 404 body, encoded once instead of on every miss
+NO_USER_SESSIONS_ERROR = json.dumps({'error': 'No completed sessions found for this user'}).encode()
+
+
 @extend_schema(
     summary="Скачать PDF сертификат по UUID пользователя",
     description="""Скачать PDF сертификат для пользователя по его UUID.
@@ -1603,9 +1825,9 @@ class GetUserCertificateDataView(APIView):
     parameters=[
         OpenApiParameter(
             name='user_uuid',
-            type=OpenApiTypes.STR,
+            type=OpenApiTypes.INT,
             location=OpenApiParameter.PATH,
-            description='UUID пользователя',
+            description='ID пользователя',
             required=True
         )
     ],
@@ -1641,107 +1863,50 @@ class DownloadUserCertificatePDFView(View):
     
     def get(self, request, user_uuid, *args, **kwargs):
         """Generate and download PDF certificate for user's best session."""
-        from apps.users.models import User
-        
-        try:
-            # Get user by UUID
-            user = User.objects.get(id=user_uuid)
-        except User.DoesNotExist:
-            return HttpResponse(
-                '{"error": "User not found"}', 
-                content_type="application/json", 
-                status=404
-            )
-        
-        # Get session with highest score for this user
+        # Get session with highest score for this user; a missing user
+        # simply has no sessions
         session = SurveySession.objects.filter(
-            user=user,
+            user_id=user_uuid,
             score__isnull=False  # Only sessions with scores
+        ).select_related('user', 'survey').only(
+            'id', 'score', 'completed_at', 'user__id', 'user__name', 'survey__id', 'survey__title'
         ).order_by('-score', '-completed_at').first()
         
         if not session:
-            return HttpResponse(
-                '{"error": "No completed sessions found for this user"}', 
-                content_type="application/json", 
-                status=404
-            )
+            return HttpResponseNotFound(NO_USER_SESSIONS_ERROR, content_type="application/json")
         
-        # Construct certificate URL
-        from django.conf import settings
-        base_url = getattr(settings, 'CERTIFICATE_BASE_URL', 'https://savollar.leetcode.uz')
-        if not base_url.endswith('/'):
-            base_url += '/'
-        
-        certificate_url = f"{base_url}certificate/{session.id}"
-        
-        # Prepare data for Gotenberg
-        gotenberg_url = "http://gotenberg:3000/forms/chromium/convert/url"
-        
-        # Options for PDF generation - using multipart/form-data
-        # Need at least one file to trigger multipart/form-data content type
-        files = {"dummy": ("", "", "text/plain")}
-        data = {
-            "url": certificate_url,
-            "marginTop": "0",
-            "marginBottom": "0", 
-            "marginLeft": "0",
-            "marginRight": "0",
-            "format": "A4",
-            "landscape": "true",
-            "waitTimeout": "10s",
-            "waitForSelector": "body",
-        }
+        certificate_url = get_certificate_url(session.id)
+        
+        cache_key = _certificate_pdf_cache_key(session)
         
         try:
-            # Give the certificate page time to fully render on the frontend
-            time.sleep(4)
-            logger.info(f"Converting user certificate to PDF: {certificate_url}")
-            
-            # Send request to Gotenberg with multipart/form-data
-            response = requests.post(
-                gotenberg_url, 
-                data=data,
-                files=files,
-                timeout=60
-            )
-            response.raise_for_status()
-            
-            # Get PDF content from Gotenberg response
-            pdf_content = response.content
+            http_response = _rendered_certificate_response(session, cache_key)
+            if http_response is None:
+                response = convert_url_to_pdf(certificate_url, stream=True)
+                
+                # Stream the PDF to the client as Gotenberg sends it
+                http_response = StreamingHttpResponse(
+                    _stream_and_store_pdf(response, session, cache_key),
+                    content_type="application/pdf"
+                )
             
-            # Return PDF file for download
-            http_response = HttpResponse(pdf_content, content_type="application/pdf")
-            http_response["Content-Disposition"] = f'attachment; filename="certificate_{user.name}_{session.survey.title}.pdf"'
+            http_response["Content-Disposition"] = _certificate_content_disposition(session)
             return http_response
             
+        except GotenbergUnavailable:
+            return JsonResponse({'error': 'PDF service is temporarily unavailable'}, status=503)
         except requests.exceptions.Timeout:
             logger.error(f"Timeout when converting user certificate to PDF: {certificate_url}")
-            return HttpResponse(
-                '{"error": "Timeout: Certificate page took too long to load"}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': 'Timeout: Certificate page took too long to load'}, status=500)
         except requests.exceptions.ConnectionError:
             logger.error("Connection error when connecting to Gotenberg")
-            return HttpResponse(
-                '{"error": "Error generating PDF: Cannot connect to PDF service"}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': 'Error generating PDF: Cannot connect to PDF service'}, status=500)
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error when converting user certificate to PDF: {str(e)}")
-            return HttpResponse(
-                f'{{"error": "Error generating PDF: {str(e)}"}}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': f'Error generating PDF: {e}'}, status=500)
         except Exception as e:
             logger.error(f"Unexpected error when converting user certificate to PDF: {str(e)}")
-            return HttpResponse(
-                f'{{"error": "Unexpected error: {str(e)}"}}', 
-                content_type="application/json", 
-                status=500
-            )
+            return JsonResponse({'error': f'Unexpected error: {e}'}, status=500)
 
 
 @extend_schema_view(
@@ -1751,6 +1916,20 @@ class ProctorViewSet(GenericViewSet):
     """ViewSet for proctoring functionality."""
     
     permission_classes = [permissions.IsAuthenticated]
+    session_owner_cache_timeout = 60 * 60
+    
+    def get_owned_session_id(self, session_id):
+        """Check that the session belongs to the current user, caching the owner."""
+        cache_key = SurveySession.owner_cache_key(session_id)
+        owner_id = cache.get(cache_key)
+        if owner_id is None:
+            owner_id = SurveySession.objects.filter(id=session_id).values_list('user_id', flat=True).first()
+            if owner_id is None:
+                raise Http404
+            cache.set(cache_key, owner_id, self.session_owner_cache_timeout)
+        if str(owner_id) != str(self.request.user.id):
+            raise Http404
+        return session_id
     
     @extend_schema(
         summary="Verify initial face",
@@ -1910,17 +2089,31 @@ class ProctorViewSet(GenericViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        session = get_object_or_404(SurveySession, id=session_id, user=request.user)
+        session_id = self.get_owned_session_id(session_id)
         
-        # Create verification record with proper boolean conversion
-        FaceVerification.objects.create(
-            session=session,
-            face_detected=to_boolean(face_data.get('face_detected'), False),
-            face_count=face_data.get('face_count', 0),
-            confidence_score=face_data.get('confidence'),
-            looking_at_screen=to_boolean(face_data.get('looking_at_screen'), True),
-            mobile_device_detected=to_boolean(face_data.get('mobile_detected'), False)
-        )
+        # Buffered entries are inserted in batches, so a bad value must be
+        # rejected here rather than fail the insert of other heartbeats
+        try:
+            face_count = int(face_data.get('face_count', 0))
+            confidence = face_data.get('confidence')
+            confidence_score = float(confidence) if confidence is not None else None
+        except (AttributeError, TypeError, ValueError):
+            return Response(
+                {'error': 'face_data.face_count must be an integer and face_data.confidence a number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Buffer the verification record; flush_face_verifications writes
+        # buffered heartbeats to the database in batches
+        heartbeat_buffer.push({
+            'session_id': str(session_id),
+            'timestamp': timezone.now().isoformat(),
+            'face_detected': to_boolean(face_data.get('face_detected'), False),
+            'face_count': face_count,
+            'confidence_score': confidence_score,
+            'looking_at_screen': to_boolean(face_data.get('looking_at_screen'), True),
+            'mobile_device_detected': to_boolean(face_data.get('mobile_detected'), False)
+        })
         
         return Response({'status': 'ok'})
     
@@ -2026,7 +2219,7 @@ class ProctorViewSet(GenericViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        session = get_object_or_404(SurveySession, id=session_id, user=request.user)
+        session_id = self.get_owned_session_id(session_id)
         
         # Add proper file extension if missing
         video_chunk = add_file_extension(video_chunk)
@@ -2035,7 +2228,7 @@ class ProctorViewSet(GenericViewSet):
         
         # Check if chunk already exists and update it if needed
         chunk, created = VideoChunk.objects.update_or_create(
-            session=session,
+            session_id=session_id,
             chunk_number=chunk_number_int,
             defaults={
                 'chunk_file': video_chunk,
@@ -2050,7 +2243,7 @@ class ProctorViewSet(GenericViewSet):
             }
         )
         
-        total_chunks = session.video_chunks.count()
+        total_chunks = VideoChunk.objects.filter(session_id=session_id).count()
         
         # Start async transcoding to TS format
         transcode_chunk_to_ts.delay(chunk.id)
@@ -2092,8 +2285,8 @@ class ProctorViewSet(GenericViewSet):
     @action(detail=False, methods=['get'], url_path='session/(?P<session_id>[^/.]+)/chunks')
     def get_video_chunks(self, request, session_id=None):
         """Get all video chunks for a session."""
-        session = get_object_or_404(SurveySession, id=session_id, user=request.user)
-        chunks = session.video_chunks.all().order_by('chunk_number')
+        session_id = self.get_owned_session_id(session_id)
+        chunks = VideoChunk.objects.filter(session_id=session_id).order_by('chunk_number')
         
         total_duration = sum(chunk.duration_seconds for chunk in chunks)
         
@@ -2110,7 +2303,7 @@ class ProctorViewSet(GenericViewSet):
         } for chunk in chunks]
         
         return Response({
-            'session_id': str(session.id),
+            'session_id': str(session_id),
             'total_chunks': chunks.count(),
             'total_duration': total_duration,
             'chunks': chunks_data
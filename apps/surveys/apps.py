@@ -1,3 +1,5 @@
+import contextlib
+
 from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 
@@ -6,3 +8,7 @@ class SurveysConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.surveys'
     verbose_name = _("Surveys")
+
+    def ready(self):
+        with contextlib.suppress(ImportError):
+            import apps.surveys.signals  # noqa: F401, PLC0415
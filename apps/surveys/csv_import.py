@@ -0,0 +1,73 @@
+"""Helpers shared by the CSV import management commands."""
+import csv
+import mmap
+import os
+from contextlib import contextmanager
+
+try:
+    import pandas as pd
+except ImportError:  # pandas is optional, the csv module is used without it
+    pd = None
+
+# Read large imports in 1 MiB blocks instead of the default 8 KiB
+CSV_READ_BUFFER_SIZE = 1 << 20
+# Rows parsed per pandas chunk, which bounds memory on large files
+CSV_CHUNK_SIZE = 10_000
+# Files above this size are memory-mapped instead of read through a buffer
+CSV_MMAP_MIN_SIZE = 16 * 1024 * 1024
+
+
+@contextmanager
+def open_csv_rows(csv_file_path):
+    """
+    Open a UTF-8 CSV file for row-by-row reading.
+
+    Yields a (header, rows) pair where header is the list of column names
+    and rows iterates over each data row as a sequence of strings. When
+    pandas is installed its C parser reads the file in chunks. Files larger
+    than CSV_MMAP_MIN_SIZE are memory-mapped.
+    """
+    use_mmap = os.path.getsize(csv_file_path) > CSV_MMAP_MIN_SIZE
+
+    if pd is not None:
+        header = list(pd.read_csv(csv_file_path, nrows=0, encoding='utf-8').columns)
+        with pd.read_csv(
+            csv_file_path,
+            encoding='utf-8',
+            chunksize=CSV_CHUNK_SIZE,
+            dtype=str,
+            keep_default_na=False,
+            memory_map=use_mmap
+        ) as chunks:
+            yield header, (row for chunk in chunks for row in chunk.itertuples(index=False, name=None))
+        return
+
+    if use_mmap:
+        with open(csv_file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # Lines keep their endings, so quoted multi-line fields parse as with newline=''
+            reader = csv.reader(line.decode('utf-8') for line in iter(mapped.readline, b''))
+            yield next(reader, []), reader
+        return
+
+    with open(csv_file_path, 'r', encoding='utf-8', newline='', buffering=CSV_READ_BUFFER_SIZE) as file:
+        reader = csv.reader(file)
+        yield next(reader, []), reader
+
+
+class BufferedOutput:
+    """Collect command output lines and write them to stdout in batches."""
+
+    def __init__(self, stdout, batch_size=1000):
+        self.stdout = stdout
+        self.batch_size = batch_size
+        self.lines = []
+
+    def write(self, msg):
+        self.lines.append(msg)
+        if len(self.lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.stdout.write('\n'.join(self.lines))
+            self.lines.clear()
@@ -0,0 +1,143 @@
+"""Gotenberg client for rendering certificate pages to PDF."""
+import logging
+from types import MappingProxyType
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+GOTENBERG_CONVERT_URL = "http://gotenberg:3000/forms/chromium/convert/url"
+PDF_CHUNK_SIZE = 64 * 1024
+# Fail fast when Gotenberg is unreachable, but give Chromium time to render
+GOTENBERG_TIMEOUT = (2, 60)
+
+# Circuit breaker: after BREAKER_FAIL_MAX consecutive failures, calls are
+# rejected without contacting Gotenberg for BREAKER_RESET_TIMEOUT seconds.
+# State lives in the cache so it is shared by all web and Celery workers.
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_TIMEOUT = 30
+BREAKER_FAILURES_KEY = "gotenberg:failures"
+BREAKER_OPEN_KEY = "gotenberg:circuit_open"
+CERTIFICATE_BASE_URL = getattr(settings, 'CERTIFICATE_BASE_URL', 'https://savollar.leetcode.uz').rstrip('/') + '/'
+
+# Readiness marker of the certificate page, configured in config/settings/base.py
+CERTIFICATE_READY_SELECTOR = getattr(settings, 'CERTIFICATE_READY_SELECTOR', '')
+
+# Options for PDF generation, shared by every conversion request
+CERTIFICATE_PDF_OPTIONS = MappingProxyType({
+    "marginTop": "0",
+    "marginBottom": "0",
+    "marginLeft": "0",
+    "marginRight": "0",
+    "format": "A4",
+    "landscape": "true",
+    "waitTimeout": "10s",
+    "waitForExpression": "document.fonts.status === 'loaded'",
+    # Wait for the page's readiness marker when the frontend provides one;
+    # otherwise fall back to a fixed render time inside Chromium, so a page
+    # without the marker does not fail every conversion after waitTimeout
+    **(
+        {"waitForSelector": CERTIFICATE_READY_SELECTOR}
+        if CERTIFICATE_READY_SELECTOR else
+        {"waitDelay": "2s"}
+    ),
+})
+
+# Shared session so TCP connections to Gotenberg are pooled and reused
+# across requests and Celery tasks instead of being opened per call
+gotenberg_session = requests.Session()
+gotenberg_session.mount("http://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    # Rendering is idempotent, so retry POSTs when Gotenberg is briefly unavailable
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset(["POST"])
+    )
+))
+
+
+class GotenbergUnavailable(requests.exceptions.RequestException):
+    """Raised while the circuit breaker is open."""
+
+
+def _record_failure():
+    """Count a Gotenberg failure and open the circuit at the threshold."""
+    try:
+        failures = cache.incr(BREAKER_FAILURES_KEY)
+    except ValueError:
+        cache.set(BREAKER_FAILURES_KEY, 1, BREAKER_RESET_TIMEOUT)
+        failures = 1
+    if failures >= BREAKER_FAIL_MAX:
+        logger.warning(f"Gotenberg failed {failures} times in a row, opening circuit")
+        cache.set(BREAKER_OPEN_KEY, True, BREAKER_RESET_TIMEOUT)
+        cache.delete(BREAKER_FAILURES_KEY)
+
+
+def multipart_fields(data):
+    """
+    Encode form fields as multipart/form-data parts, which Gotenberg requires.
+
+    A (None, value) tuple makes requests send a plain field without a filename.
+    """
+    return {name: (None, value) for name, value in data.items()}
+
+
+def get_certificate_url(session_id):
+    """Build the frontend certificate page URL for a survey session."""
+    return f"{CERTIFICATE_BASE_URL}certificate/{session_id}"
+
+
+def convert_url_to_pdf(certificate_url, stream=False):
+    """
+    Render a certificate page to PDF with Gotenberg.
+
+    Args:
+        certificate_url: Absolute URL of the certificate page
+        stream: Leave the body unread so it can be consumed with iter_pdf_chunks
+
+    Returns:
+        requests.Response with the PDF body
+
+    Raises:
+        GotenbergUnavailable: If the circuit breaker is open
+        requests.exceptions.RequestException: If Gotenberg fails
+    """
+    if cache.get(BREAKER_OPEN_KEY):
+        raise GotenbergUnavailable("PDF service is temporarily unavailable")
+
+    data = {**CERTIFICATE_PDF_OPTIONS, "url": certificate_url}
+
+    logger.info(f"Converting certificate to PDF: {certificate_url}")
+    try:
+        response = gotenberg_session.post(
+            GOTENBERG_CONVERT_URL,
+            files=multipart_fields(data),
+            timeout=GOTENBERG_TIMEOUT,
+            stream=stream
+        )
+        response.raise_for_status()
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.RetryError):
+        _record_failure()
+        raise
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code >= 500:
+            _record_failure()
+        raise
+
+    cache.delete(BREAKER_FAILURES_KEY)
+    return response
+
+
+def iter_pdf_chunks(response):
+    """Yield a streamed Gotenberg response body and release the connection."""
+    try:
+        yield from response.iter_content(chunk_size=PDF_CHUNK_SIZE)
+    finally:
+        response.close()
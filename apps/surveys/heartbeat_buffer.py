@@ -0,0 +1,36 @@
+"""Write-behind buffer for proctoring heartbeats."""
+import functools
+import json
+
+import redis
+from django.conf import settings
+
+BUFFER_KEY = "proctoring:face_verifications"
+FLUSH_BATCH_SIZE = 1000
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    """Redis client shared by the web and Celery processes."""
+    ssl_options = {"ssl_cert_reqs": None} if settings.REDIS_SSL else {}
+    return redis.Redis.from_url(settings.REDIS_URL, **ssl_options)
+
+
+def push(entry):
+    """Append a face verification entry to the buffer."""
+    _get_client().rpush(BUFFER_KEY, json.dumps(entry))
+
+
+def pop_batch(size=FLUSH_BATCH_SIZE):
+    """Atomically remove and return up to `size` buffered entries."""
+    pipe = _get_client().pipeline()
+    pipe.lrange(BUFFER_KEY, 0, size - 1)
+    pipe.ltrim(BUFFER_KEY, size, -1)
+    entries, _ = pipe.execute()
+    return [json.loads(entry) for entry in entries]
+
+
+def requeue(entries):
+    """Put popped entries back at the head of the buffer, keeping their order."""
+    if entries:
+        _get_client().lpush(BUFFER_KEY, *(json.dumps(entry) for entry in reversed(entries)))
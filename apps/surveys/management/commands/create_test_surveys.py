@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
 from apps.surveys.models import Survey, Question, Choice
 
 
@@ -19,6 +19,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Удалить все существующие опросы',
         )
+        parser.add_argument(
+            '--orm-delete',
+            action='store_true',
+            help='Удалять опросы через ORM (с сигналами) вместо TRUNCATE',
+        )
 
     def handle(self, *args, **options):
         survey_type = options['survey_type']
@@ -26,32 +31,36 @@ class Command(BaseCommand):
 
         if clear_surveys:
             self.stdout.write('Удаление существующих опросов...')
-            Survey.objects.all().delete()
+            if options['orm_delete']:
+                Survey.objects.all().delete()
+            else:
+                self.truncate_surveys()
             self.stdout.write(
                 self.style.WARNING('Все опросы удалены.')
             )
 
-        surveys_to_create = []
-        
-        if survey_type in ['programming', 'all']:
-            surveys_to_create.append('programming')
-        if survey_type in ['math', 'all']:
-            surveys_to_create.append('math')
-        if survey_type in ['general', 'all']:
-            surveys_to_create.append('general')
+        survey_builders = {
+            'programming': self.create_programming_survey,
+            'math': self.create_math_survey,
+            'general': self.create_general_survey,
+        }
 
-        for survey in surveys_to_create:
-            if survey == 'programming':
-                self.create_programming_survey()
-            elif survey == 'math':
-                self.create_math_survey()
-            elif survey == 'general':
-                self.create_general_survey()
+        created_count = 0
+        for name, builder in survey_builders.items():
+            if survey_type in (name, 'all'):
+                builder()
+                created_count += 1
 
         self.stdout.write(
-            self.style.SUCCESS(f'\nУспешно создано {len(surveys_to_create)} опросов!')
+            self.style.SUCCESS(f'\nУспешно создано {created_count} опросов!')
         )
 
+    def truncate_surveys(self):
+        """Очищает опросы и все зависимые таблицы одной командой TRUNCATE."""
+        table = connection.ops.quote_name(Survey._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {table} RESTART IDENTITY CASCADE')
+
     def create_programming_survey(self):
         """Создает опрос по программированию."""
         with transaction.atomic():
@@ -288,8 +297,8 @@ class Command(BaseCommand):
 
     def create_questions(self, survey, questions_data):
         """Создает вопросы для опроса."""
-        for i, q_data in enumerate(questions_data, 1):
-            question = Question.objects.create(
+        questions = Question.objects.bulk_create([
+            Question(
                 survey=survey,
                 question_type=q_data['type'],
                 text_uz=q_data['text']['uz'],
@@ -298,16 +307,21 @@ class Command(BaseCommand):
                 points=q_data['points'],
                 order=i
             )
+            for i, q_data in enumerate(questions_data, 1)
+        ])
 
-            if 'choices' in q_data:
-                for j, choice_data in enumerate(q_data['choices'], 1):
-                    Choice.objects.create(
-                        question=question,
-                        text_uz=choice_data['text']['uz'],
-                        text_uz_cyrl=choice_data['text']['uz_cyrl'],
-                        text_ru=choice_data['text']['ru'],
-                        is_correct=choice_data['correct'],
-                        order=j
-                    )
+        choices = []
+        for i, (question, q_data) in enumerate(zip(questions, questions_data), 1):
+            for j, choice_data in enumerate(q_data.get('choices', []), 1):
+                choices.append(Choice(
+                    question=question,
+                    text_uz=choice_data['text']['uz'],
+                    text_uz_cyrl=choice_data['text']['uz_cyrl'],
+                    text_ru=choice_data['text']['ru'],
+                    is_correct=choice_data['correct'],
+                    order=j
+                ))
 
             self.stdout.write(f'  Создан вопрос {i}: {question.text_ru[:50]}...')
+
+        Choice.objects.bulk_create(choices, batch_size=500)
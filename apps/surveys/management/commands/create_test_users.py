@@ -1,7 +1,7 @@
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from apps.users.models import User
-from phonenumber_field.phonenumber import PhoneNumber
+from apps.users.models import BranchStaff, PositionStaff, User
 import random
 
 
@@ -83,17 +83,18 @@ class Command(BaseCommand):
         ]
 
         with transaction.atomic():
+            positions_cache = {}
+
             # Создаем модератора если требуется
             if with_moderator:
                 moderator_phone = '+998901000000'
                 if not User.objects.filter(phone_number=moderator_phone).exists():
                     moderator = User.objects.create_user(
-                        phone_number=PhoneNumber.from_string(moderator_phone),
+                        phone_number=moderator_phone,
                         name='Модератор Тестовый',
                         password='moderator123',
                         is_moderator=True,
-                        branch='Главный офис',
-                        position='Модератор системы',
+                        position=self.get_position(positions_cache, 'Главный офис', 'Модератор системы'),
                         is_phone_verified=True
                     )
                     self.stdout.write(
@@ -101,46 +102,46 @@ class Command(BaseCommand):
                     )
 
             # Создаем обычных пользователей
-            created_count = 0
+            # Все тестовые пользователи имеют один пароль, поэтому хешируем его один раз
+            hashed_password = make_password('user123')  # Простой пароль для тестирования
+            existing_phones = set(
+                User.objects.filter(phone_number__startswith='+99890').values_list('phone_number', flat=True)
+            )
+            # Случайные данные выбираются сразу для всех пользователей
+            random_first_names = random.choices(first_names, k=count)
+            random_last_names = random.choices(last_names, k=count)
+            random_branches = random.choices(branches, k=count)
+            random_positions = random.choices(positions, k=count)
+            users = []
             for i in range(count):
                 # Генерируем уникальный номер телефона
                 phone_base = f'+99890{1001000 + i:07d}'
                 
                 # Проверяем, что пользователь с таким номером не существует
-                if User.objects.filter(phone_number=phone_base).exists():
+                if phone_base in existing_phones:
                     continue
 
-                # Генерируем случайные данные
-                first_name = random.choice(first_names)
-                last_name = random.choice(last_names)
-                full_name = f'{first_name} {last_name}'
-                branch = random.choice(branches)
-                position = random.choice(positions)
-
-                try:
-                    user = User.objects.create_user(
-                        phone_number=PhoneNumber.from_string(phone_base),
-                        name=full_name,
-                        password='user123',  # Простой пароль для тестирования
-                        is_moderator=False,
-                        branch=branch,
-                        position=position,
-                        is_phone_verified=True
-                    )
-                    created_count += 1
-                    
-                    if created_count <= 3:  # Показываем первых 3 для примера
-                        self.stdout.write(
-                            f'Создан пользователь: {user.name} ({user.phone_number}) - {user.position.branch.name_uz if user.position and user.position.branch else "N/A"}, {user.position.name_uz if user.position else "N/A"}'
-                        )
-                    elif created_count == 4:
-                        self.stdout.write('...')
-
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Ошибка при создании пользователя {phone_base}: {e}')
-                    )
-                    continue
+                users.append(User(
+                    phone_number=phone_base,
+                    name=f'{random_first_names[i]} {random_last_names[i]}',
+                    password=hashed_password,
+                    is_moderator=False,
+                    position=self.get_position(positions_cache, random_branches[i], random_positions[i]),
+                    is_phone_verified=True
+                ))
+
+            User.objects.bulk_create(users, batch_size=1000, ignore_conflicts=True)
+            # ignore_conflicts пропускает уже существующих, поэтому считаем строки в базе
+            created_count = (
+                User.objects.filter(phone_number__startswith='+99890').count() - len(existing_phones)
+            )
+
+            for user in users[:3]:  # Показываем первых 3 для примера
+                self.stdout.write(
+                    f'Создан пользователь: {user.name} ({user.phone_number}) - {user.position.branch.name_uz}, {user.position.name_uz}'
+                )
+            if created_count > 3:
+                self.stdout.write('...')
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -155,3 +156,13 @@ class Command(BaseCommand):
             if with_moderator:
                 self.stdout.write('- Пароль модератора: moderator123')
             self.stdout.write('\nВсе пользователи имеют подтвержденные номера телефонов.')
+
+    def get_position(self, positions_cache, branch_name, position_name):
+        """Возвращает должность в филиале, создавая их при необходимости."""
+        key = (branch_name, position_name)
+        if key not in positions_cache:
+            branch, _ = BranchStaff.objects.get_or_create(name_uz=branch_name, defaults={'name_ru': branch_name})
+            positions_cache[key], _ = PositionStaff.objects.get_or_create(
+                branch=branch, name_uz=position_name, defaults={'name_ru': position_name}
+            )
+        return positions_cache[key]
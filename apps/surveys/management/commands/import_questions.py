@@ -1,11 +1,113 @@
-import csv
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from apps.surveys.csv_import import BufferedOutput, open_csv_rows
 from apps.surveys.models import Survey, Question, Choice
 from apps.contrib.constants import UserWorkDomainChoices, QuestionCategoryChoices
 
 
+QUESTION_COLUMNS = (
+    'question_order', 'question_type', 'text_uz', 'text_uz_cyrl', 'text_ru',
+    'points', 'is_active', 'work_domain', 'category',
+)
+
+# Spellings accepted as true in boolean cells, matched without lowercasing
+TRUE_VALUES = frozenset({'true', 'True', 'TRUE', '1', 'yes', 't'})
+
+QUESTION_TYPES = ('single', 'multiple', 'open')
+
+# Rows sent to a worker process at a time with --workers
+PARSE_CHUNK_SIZE = 1000
+
+CHOICE_COLUMN_RE = re.compile(r'choice_(\d+)_text_uz$')
+
+QUESTION_UPDATE_FIELDS = [
+    'question_type', 'text_uz', 'text_uz_cyrl', 'text_ru',
+    'points', 'is_active', 'work_domain', 'category',
+]
+
+
+def get_choice_columns(columns):
+    """Column indexes of choices 1..N, where N is the highest choice_N_text_uz header."""
+    max_choice = max(
+        (int(match.group(1)) for match in map(CHOICE_COLUMN_RE.match, columns) if match),
+        default=0
+    )
+    return [
+        (
+            n,
+            columns.get(f'choice_{n}_text_uz'),
+            columns.get(f'choice_{n}_text_uz_cyrl'),
+            columns.get(f'choice_{n}_text_ru'),
+            columns.get(f'choice_{n}_is_correct'),
+        )
+        for n in range(1, max_choice + 1)
+    ]
+
+
+def get_cell(row, index, default=''):
+    """Return a CSV cell by column index, or default if the column is missing."""
+    if index is None or index >= len(row):
+        return default
+    return row[index]
+
+
+def parse_question_row(row, idx, choice_columns):
+    """
+    Convert a CSV row to question fields and choices.
+
+    Runs in worker processes with --workers, so it must not touch the
+    database. Returns {'error': message} when a number cannot be parsed.
+    """
+    # Only the number conversions can fail; such rows are skipped
+    try:
+        question_order = int(get_cell(row, idx['question_order'], 0))
+        points = int(get_cell(row, idx['points']) or 1)
+    except ValueError as e:
+        return {'error': str(e)}
+
+    question_type = get_cell(row, idx['question_type']).strip()
+    invalid_type = None
+    if question_type not in QUESTION_TYPES:
+        invalid_type, question_type = question_type, 'single'
+
+    choices_data = None
+    if question_type in ['single', 'multiple']:
+        choices_data = []
+        for choice_num, uz_idx, uz_cyrl_idx, ru_idx, is_correct_idx in choice_columns:
+            choice_text_uz = get_cell(row, uz_idx).strip()
+            if not choice_text_uz:
+                break
+
+            choices_data.append({
+                'text_uz': choice_text_uz,
+                'text_uz_cyrl': get_cell(row, uz_cyrl_idx).strip(),
+                'text_ru': get_cell(row, ru_idx).strip(),
+                'is_correct': get_cell(row, is_correct_idx, 'false') in TRUE_VALUES,
+                'order': choice_num
+            })
+
+    return {
+        'order': question_order,
+        'invalid_type': invalid_type,
+        'fields': {
+            'question_type': question_type,
+            'text_uz': get_cell(row, idx['text_uz']).strip(),
+            'text_uz_cyrl': get_cell(row, idx['text_uz_cyrl']).strip(),
+            'text_ru': get_cell(row, idx['text_ru']).strip(),
+            'points': points,
+            'is_active': get_cell(row, idx['is_active'], 'true') in TRUE_VALUES,
+            'work_domain': get_cell(row, idx['work_domain']).strip(),
+            'category': get_cell(row, idx['category'], 'other').strip(),
+        },
+        'choices': choices_data,
+    }
+
+
 class Command(BaseCommand):
     help = 'Import questions and choices for a specific survey from CSV file'
 
@@ -20,10 +122,17 @@ class Command(BaseCommand):
             type=str,
             help='Path to the CSV file containing questions and choices data'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes used to parse CSV rows (default: 1, no extra processes)'
+        )
 
     def handle(self, *args, **options):
         survey_id = options['survey_id']
         csv_file_path = options['csv_file']
+        workers = options['workers']
         
         if not os.path.exists(csv_file_path):
             raise CommandError(f'CSV file "{csv_file_path}" does not exist.')
@@ -36,124 +145,105 @@ class Command(BaseCommand):
         questions_created = 0
         questions_updated = 0
         choices_created = 0
-        choices_updated = 0
         
+        output = BufferedOutput(self.stdout)
         try:
-            with open(csv_file_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
+            with open_csv_rows(csv_file_path) as (header, rows):
+                # Resolve column positions once instead of building a dict per row
+                columns = {name: index for index, name in enumerate(header)}
+                idx = {name: columns.get(name) for name in QUESTION_COLUMNS}
+                choice_columns = get_choice_columns(columns)
+                
+                # Existing questions are loaded once and written back in bulk
+                questions_by_order = {q.order: q for q in Question.objects.filter(survey=survey)}
+                to_create = []
+                to_update = {}
+                choices_by_order = {}
+                invalid_rows = []
                 
-                with transaction.atomic():
-                    for row_num, row in enumerate(reader, start=2):  # Start from 2 because of header
-                        try:
-                            # Required fields
-                            question_order = int(row.get('question_order', 0))
-                            question_type = row.get('question_type', '').strip()
-                            text_uz = row.get('text_uz', '').strip()
-                            
-                            if not text_uz:
-                                self.stdout.write(
-                                    self.style.WARNING(f'Row {row_num}: Skipping question without text_uz')
-                                )
-                                continue
-
-                            # Validate question type
-                            valid_types = ['single', 'multiple', 'open']
-                            if question_type not in valid_types:
-                                self.stdout.write(
-                                    self.style.WARNING(f'Row {row_num}: Invalid question_type "{question_type}". Using "single".')
-                                )
-                                question_type = 'single'
-
-                            # Get or create question
-                            question, question_created = Question.objects.get_or_create(
-                                survey=survey,
-                                order=question_order,
-                                defaults={
-                                    'question_type': question_type,
-                                    'text_uz': text_uz,
-                                    'text_uz_cyrl': row.get('text_uz_cyrl', '').strip(),
-                                    'text_ru': row.get('text_ru', '').strip(),
-                                    'points': int(row.get('points', 1)),
-                                    'is_active': row.get('is_active', 'true').lower() == 'true',
-                                    'work_domain': row.get('work_domain', '').strip(),
-                                    'category': row.get('category', 'other').strip(),
-                                }
+                parse_row = partial(parse_question_row, idx=idx, choice_columns=choice_columns)
+                with ExitStack() as stack:
+                    if workers > 1:
+                        # Rows are converted in worker processes; all database work stays here
+                        executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+                        parsed_rows = executor.map(parse_row, rows, chunksize=PARSE_CHUNK_SIZE)
+                    else:
+                        parsed_rows = map(parse_row, rows)
+
+                    for row_num, parsed in enumerate(parsed_rows, start=2):  # Start from 2 because of header
+                        if 'error' in parsed:
+                            invalid_rows.append(row_num)
+                            output.write(
+                                self.style.ERROR(f'Row {row_num}: Error processing question - {parsed["error"]}')
                             )
-                            
-                            if question_created:
-                                questions_created += 1
-                                self.stdout.write(f'Created question {question_order}: {text_uz[:50]}...')
-                            else:
-                                # Update existing question
-                                question.question_type = question_type
-                                question.text_uz = text_uz
-                                question.text_uz_cyrl = row.get('text_uz_cyrl', '').strip()
-                                question.text_ru = row.get('text_ru', '').strip()
-                                question.points = int(row.get('points', 1))
-                                question.is_active = row.get('is_active', 'true').lower() == 'true'
-                                question.work_domain = row.get('work_domain', '').strip()
-                                question.category = row.get('category', 'other').strip()
-                                question.save()
-                                questions_updated += 1
-                                self.stdout.write(f'Updated question {question_order}: {text_uz[:50]}...')
-
-                            # Handle choices for single/multiple choice questions
-                            if question_type in ['single', 'multiple']:
-                                # Clear existing choices
-                                question.choices.all().delete()
-                                
-                                # Parse choices
-                                choices_data = []
-                                choice_num = 1
-                                while True:
-                                    choice_text_uz = row.get(f'choice_{choice_num}_text_uz', '').strip()
-                                    if not choice_text_uz:
-                                        break
-                                    
-                                    choice_text_uz_cyrl = row.get(f'choice_{choice_num}_text_uz_cyrl', '').strip()
-                                    choice_text_ru = row.get(f'choice_{choice_num}_text_ru', '').strip()
-                                    is_correct = row.get(f'choice_{choice_num}_is_correct', 'false').lower() == 'true'
-                                    
-                                    choices_data.append({
-                                        'text_uz': choice_text_uz,
-                                        'text_uz_cyrl': choice_text_uz_cyrl,
-                                        'text_ru': choice_text_ru,
-                                        'is_correct': is_correct,
-                                        'order': choice_num
-                                    })
-                                    
-                                    choice_num += 1
-                                
-                                # Create choices
-                                for choice_data in choices_data:
-                                    choice, choice_created = Choice.objects.get_or_create(
-                                        question=question,
-                                        order=choice_data['order'],
-                                        defaults=choice_data
-                                    )
-                                    
-                                    if choice_created:
-                                        choices_created += 1
-                                    else:
-                                        # Update existing choice
-                                        for key, value in choice_data.items():
-                                            setattr(choice, key, value)
-                                        choice.save()
-                                        choices_updated += 1
-
-                        except Exception as e:
-                            self.stdout.write(
-                                self.style.ERROR(f'Row {row_num}: Error processing question - {str(e)}')
+                            continue
+
+                        question_order = parsed['order']
+                        fields = parsed['fields']
+                        text_uz = fields['text_uz']
+
+                        if not text_uz:
+                            output.write(
+                                self.style.WARNING(f'Row {row_num}: Skipping question without text_uz')
                             )
                             continue
 
+                        if parsed['invalid_type'] is not None:
+                            output.write(
+                                self.style.WARNING(f'Row {row_num}: Invalid question_type "{parsed["invalid_type"]}". Using "single".')
+                            )
+
+                        question = questions_by_order.get(question_order)
+                        if question is None:
+                            question = Question(survey=survey, order=question_order, **fields)
+                            questions_by_order[question_order] = question
+                            to_create.append(question)
+                            questions_created += 1
+                            output.write(f'Created question {question_order}: {text_uz[:50]}...')
+                        else:
+                            # Update existing question
+                            for field, value in fields.items():
+                                setattr(question, field, value)
+                            if question.pk:
+                                to_update[question_order] = question
+                            questions_updated += 1
+                            output.write(f'Updated question {question_order}: {text_uz[:50]}...')
+
+                        # Handle choices for single/multiple choice questions
+                        if parsed['choices'] is not None:
+                            choices_by_order[question_order] = parsed['choices']
+
+            output.flush()
+
+            # Only the writes run in a transaction; the CSV is parsed before it
+            with transaction.atomic():
+                Question.objects.bulk_create(to_create)
+                Question.objects.bulk_update(to_update.values(), fields=QUESTION_UPDATE_FIELDS, batch_size=500)
+
+                # Replace the choices of every imported choice question
+                replaced_questions = [questions_by_order[question_order] for question_order in choices_by_order]
+                Choice.objects.filter(question_id__in=[question.pk for question in replaced_questions]).delete()
+                new_choices = [
+                    Choice(question=question, **choice_data)
+                    for question, choices_data in zip(replaced_questions, choices_by_order.values())
+                    for choice_data in choices_data
+                ]
+                Choice.objects.bulk_create(new_choices, batch_size=500)
+                choices_created = len(new_choices)
+
         except Exception as e:
+            output.flush()
             raise CommandError(f'Error reading CSV file: {str(e)}')
 
+        if invalid_rows:
+            self.stdout.write(
+                self.style.WARNING(f'Skipped {len(invalid_rows)} invalid rows: {", ".join(map(str, invalid_rows))}')
+            )
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'Import completed for survey "{survey.title}". '
                 f'Questions: Created {questions_created}, Updated {questions_updated}. '
-                f'Choices: Created {choices_created}, Updated {choices_updated}.'
+                f'Choices: Created {choices_created}.'
             )
         )
@@ -1,11 +1,27 @@
-import csv
 import os
+from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from apps.surveys.csv_import import BufferedOutput, open_csv_rows
 from apps.surveys.models import Survey, SurveyEmployeeLevelConfig
 from apps.contrib.constants import EmployeeLevelChoices
 
 
+# Spellings accepted as true in boolean cells, matched without lowercasing
+TRUE_VALUES = frozenset({'true', 'True', 'TRUE', '1', 'yes', 't'})
+
+# (level, label, per-level questions count column), resolved once at import
+EMPLOYEE_LEVELS = tuple(
+    (level_choice, level_display, f'questions_count_{level_choice}')
+    for level_choice, level_display in EmployeeLevelChoices.choices
+)
+
+SURVEY_UPDATE_FIELDS = [
+    'description', 'is_active', 'time_limit_minutes', 'questions_count', 'passing_score',
+    'max_attempts', 'safety_logic_psychology_percentage', 'other_percentage',
+]
+
+
 class Command(BaseCommand):
     help = 'Import surveys from CSV file'
 
@@ -25,81 +41,104 @@ class Command(BaseCommand):
         created_count = 0
         updated_count = 0
         
+        output = BufferedOutput(self.stdout)
         try:
-            with open(csv_file_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
+            with open_csv_rows(csv_file_path) as (header, rows):
+                # Existing surveys are loaded once and written back in bulk
+                surveys_by_title = {survey.title: survey for survey in Survey.objects.all()}
+                to_create = []
+                to_update = {}
+                level_configs = {}
+                invalid_rows = []
                 
-                with transaction.atomic():
-                    for row_num, row in enumerate(reader, start=2):  # Start from 2 because of header
-                        try:
-                            # Required fields
-                            title = row.get('title', '').strip()
-                            if not title:
-                                self.stdout.write(
-                                    self.style.WARNING(f'Row {row_num}: Skipping survey without title')
-                                )
-                                continue
-
-                            # Get or create survey
-                            survey, created = Survey.objects.get_or_create(
-                                title=title,
-                                defaults={
-                                    'description': row.get('description', '').strip(),
-                                    'is_active': row.get('is_active', 'true').lower() == 'true',
-                                    'time_limit_minutes': int(row.get('time_limit_minutes', 60)),
-                                    'questions_count': int(row.get('questions_count', 30)),
-                                    'passing_score': int(row.get('passing_score', 70)),
-                                    'max_attempts': int(row.get('max_attempts', 3)),
-                                    'safety_logic_psychology_percentage': int(row.get('safety_logic_psychology_percentage', 70)),
-                                    'other_percentage': int(row.get('other_percentage', 30)),
-                                }
-                            )
-                            
-                            if created:
-                                created_count += 1
-                                self.stdout.write(f'Created survey: {survey.title}')
-                            else:
-                                # Update existing survey
-                                survey.description = row.get('description', '').strip()
-                                survey.is_active = row.get('is_active', 'true').lower() == 'true'
-                                survey.time_limit_minutes = int(row.get('time_limit_minutes', 60))
-                                survey.questions_count = int(row.get('questions_count', 30))
-                                survey.passing_score = int(row.get('passing_score', 70))
-                                survey.max_attempts = int(row.get('max_attempts', 3))
-                                survey.safety_logic_psychology_percentage = int(row.get('safety_logic_psychology_percentage', 70))
-                                survey.other_percentage = int(row.get('other_percentage', 30))
-                                survey.save()
-                                updated_count += 1
-                                self.stdout.write(f'Updated survey: {survey.title}')
-
-                            # Handle employee level configurations
-                            for level_choice, level_display in EmployeeLevelChoices.choices:
-                                level_key = f'questions_count_{level_choice}'
-                                if level_key in row and row[level_key].strip():
-                                    questions_count = int(row[level_key])
-                                    
-                                    config, config_created = SurveyEmployeeLevelConfig.objects.get_or_create(
-                                        survey=survey,
-                                        employee_level=level_choice,
-                                        defaults={'questions_count': questions_count}
-                                    )
-                                    
-                                    if not config_created:
-                                        config.questions_count = questions_count
-                                        config.save()
-                                    
-                                    action = 'Created' if config_created else 'Updated'
-                                    self.stdout.write(f'  {action} config for {level_display}: {questions_count} questions')
-
-                        except Exception as e:
-                            self.stdout.write(
-                                self.style.ERROR(f'Row {row_num}: Error processing survey - {str(e)}')
-                            )
-                            continue
+                for row_num, row in enumerate((dict(zip(header, values)) for values in rows), start=2):  # Start from 2 because of header
+                    # Required fields
+                    title = row.get('title', '').strip()
+                    if not title:
+                        output.write(
+                            self.style.WARNING(f'Row {row_num}: Skipping survey without title')
+                        )
+                        continue
+
+                    # Rows with bad numbers or failing Survey.clean() are skipped
+                    try:
+                        fields = {
+                            'description': row.get('description', '').strip(),
+                            'is_active': row.get('is_active', 'true') in TRUE_VALUES,
+                            'time_limit_minutes': int(row.get('time_limit_minutes') or 60),
+                            'questions_count': int(row.get('questions_count') or 30),
+                            'passing_score': int(row.get('passing_score') or 70),
+                            'max_attempts': int(row.get('max_attempts') or 3),
+                            'safety_logic_psychology_percentage': int(row.get('safety_logic_psychology_percentage') or 70),
+                            'other_percentage': int(row.get('other_percentage') or 30),
+                        }
+                        level_counts = [
+                            (level_choice, level_display, int(row[level_key]))
+                            for level_choice, level_display, level_key in EMPLOYEE_LEVELS
+                            if row.get(level_key, '').strip()
+                        ]
+                        # bulk writes skip Survey.save(), so run its clean() check here,
+                        # before an existing survey is touched
+                        Survey(title=title, **fields).clean()
+                    except (ValueError, ValidationError) as e:
+                        invalid_rows.append(row_num)
+                        output.write(
+                            self.style.ERROR(f'Row {row_num}: Error processing survey - {str(e)}')
+                        )
+                        continue
+
+                    survey = surveys_by_title.get(title)
+                    if survey is None:
+                        survey = Survey(title=title, **fields)
+                        surveys_by_title[title] = survey
+                        to_create.append(survey)
+                        created_count += 1
+                        output.write(f'Created survey: {survey.title}')
+                    else:
+                        # Update existing survey
+                        for field, value in fields.items():
+                            setattr(survey, field, value)
+                        if survey.pk:
+                            to_update[title] = survey
+                        updated_count += 1
+                        output.write(f'Updated survey: {survey.title}')
+
+                    # Handle employee level configurations
+                    for level_choice, level_display, questions_count in level_counts:
+                        # Later rows for the same survey and level win
+                        level_configs[(title, level_choice)] = SurveyEmployeeLevelConfig(
+                            survey=survey,
+                            employee_level=level_choice,
+                            questions_count=questions_count
+                        )
+
+                        output.write(f'  Set config for {level_display}: {questions_count} questions')
+
+            output.flush()
+
+            # Only the writes run in a transaction; the CSV is parsed before it
+            with transaction.atomic():
+                Survey.objects.bulk_create(to_create)
+                Survey.objects.bulk_update(to_update.values(), fields=SURVEY_UPDATE_FIELDS, batch_size=500)
+
+                # Upsert all employee level configs in a single INSERT ... ON CONFLICT
+                SurveyEmployeeLevelConfig.objects.bulk_create(
+                    level_configs.values(),
+                    update_conflicts=True,
+                    unique_fields=['survey', 'employee_level'],
+                    update_fields=['questions_count'],
+                    batch_size=500
+                )
 
         except Exception as e:
+            output.flush()
             raise CommandError(f'Error reading CSV file: {str(e)}')
 
+        if invalid_rows:
+            self.stdout.write(
+                self.style.WARNING(f'Skipped {len(invalid_rows)} invalid rows: {", ".join(map(str, invalid_rows))}')
+            )
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'Import completed. Created: {created_count}, Updated: {updated_count}'
@@ -1,173 +1,220 @@
+import os
 import re
-from collections import defaultdict
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from django.utils import timezone
+from django.db.models import Max
 
 from apps.surveys.models import Survey, Question, Choice  # adjust import to your app label
-# pip install python-docx
-from docx import Document
-
-UZ_CYR_LETTERS = {
+# lxml is installed with python-docx
+from lxml import etree
+
+# WordprocessingML tags read from word/document.xml
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = f"{W_NS}body"
+W_P = f"{W_NS}p"
+W_R = f"{W_NS}r"
+W_HYPERLINK = f"{W_NS}hyperlink"
+W_T = f"{W_NS}t"
+RUN_TEXT_TAGS = {W_T: None, f"{W_NS}tab": "\t", f"{W_NS}br": "\n", f"{W_NS}cr": "\n"}
+
+UZ_CYR_TRANS = str.maketrans({
     # Cyrillic letters used in options -> Latin index
     "А": "A", "а": "A",
     "Б": "B", "б": "B",
     "В": "C", "в": "C",
     "Г": "D", "г": "D",
     "Д": "E", "д": "E",
-}
+})
+
+# Answer key letter -> position of the option in the question
+OPTION_KEY_INDEX = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4}
 
-OPTION_PREFIX_PAT = re.compile(
-    r"^\s*([A-Da-dА-Га-г])[\.\)\:]?\s+"  # A) A. А) А. etc
-)
+# Option prefixes: A) A. A: A and the Cyrillic А) Б. etc
+OPTION_LETTERS = frozenset("ABCDabcdАБВГабвг")
+OPTION_SEPARATORS = frozenset(".):")
 
 QUESTION_NUM_PREFIX = re.compile(r"^\s*(\d{1,3})\s*[\)\.\:]\s*(.+)$")
 
+# Heading that starts the answer key section
+KEY_HEADER_PAT = re.compile(r"\b(Калит|Ключ|Key)\b", re.IGNORECASE)
+# Answer key pairs like "1  Г" or "1 Г" or "1) Г"
+KEY_PAIR_PAT = re.compile(r"(\d{1,3})\s*[\)\.:]?\s*([A-Da-dА-Га-г])")
+BULLET_PAT = re.compile(r"^[•\-–]\s+")
+WHITESPACE_PAT = re.compile(r"\s+")
+
+# --language -> (field that receives the text, fields left empty)
+LANG_FIELDS = {
+    "uz": ("text_uz", "text_uz_cyrl", "text_ru"),
+    "uz-cyrl": ("text_uz_cyrl", "text_uz", "text_ru"),
+    "ru": ("text_ru", "text_uz", "text_uz_cyrl"),
+}
+
 def clean_text(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip())
+    return WHITESPACE_PAT.sub(" ", (s or "").strip())
 
 def is_question_line(text: str) -> bool:
     t = text.strip()
     if not t:
         return False
     # numbered "1) ..." / "1. ..." / "1: ...", or ends with ?
-    if QUESTION_NUM_PREFIX.match(t):
+    # (the regex only runs on lines that start with a digit)
+    if t[0].isdigit() and QUESTION_NUM_PREFIX.match(t):
         return True
     return t.endswith("?") and len(t) > 6
 
+def option_prefix_len(line: str) -> int:
+    """
+    Length of the option prefix of a clean_text()-ed line, or 0 if it is not an option.
+    Plain character checks instead of a regex, since most lines are not options.
+    """
+    if len(line) > 2 and line[0] in OPTION_LETTERS:
+        if line[1] == " ":
+            return 2
+        if line[1] in OPTION_SEPARATORS and line[2] == " ":
+            return 3
+    return 0
+
 def normalize_option_key(ch: str) -> str:
-    ch = ch.strip()
-    if ch in UZ_CYR_LETTERS:
-        return UZ_CYR_LETTERS[ch]
-    return ch.upper()
+    return ch.strip().translate(UZ_CYR_TRANS).upper()
 
-def extract_key_table(lines):
+def apply_key_map(items, key_map):
     """
-    Extract answer key dict: {question_number(int): 'A'/'B'/...}
-    Looks for a section containing the word 'Калит' or 'Key'
-    and pairs like '1  Г' or '1) Г' or in columns.
+    Mark correct options from the answer key {question_number(int): 'A'/'B'/...}
+    for questions without inline ✅ markers, then set each item's 'multi' flag.
     """
-    key_started = False
-    key_map = {}
-    buf = []
-
-    for line in lines:
-        t = line.strip()
-        if not key_started:
-            if re.search(r"\b(Калит|Ключ|Key)\b", t, re.IGNORECASE):
-                key_started = True
-            continue
-        buf.append(t)
-
-    # Join and split by any whitespace/newline; also capture simple pairs in lines
-    # Accept formats like "1  Г" or "1 Г" or "1) Г"
-    pair_pat = re.compile(r"(\d{1,3})\s*[\)\.:]?\s*([A-Da-dА-Га-г])")
-    for t in buf:
-        for m in pair_pat.finditer(t):
-            qn = int(m.group(1))
-            key = normalize_option_key(m.group(2))
-            key_map[qn] = key
-    return key_map
-
-def parse_docx(docx_path: Path):
+    for cur in items:
+        opts = cur["choices"]
+        ok_count = sum(o["ok"] for o in opts)
+        # If no explicit correctness and have key_map + qnum, mark by key.
+        # We assume options were appended in order A..Z
+        if not ok_count and cur["qnum"]:
+            key_idx = OPTION_KEY_INDEX.get(key_map.get(cur["qnum"]))
+            if key_idx is not None and key_idx < len(opts):
+                opts[key_idx]["ok"] = True
+                ok_count = 1
+        # detect multi if >=2 ok
+        cur["multi"] = ok_count > 1
+
+def iter_paragraph_text(docx_path: Path):
+    """
+    Yield the text of each top-level body paragraph of a .docx file, like
+    python-docx's Document.paragraphs, but streamed with iterparse so the
+    whole XML tree is never held in memory.
+    """
+    with zipfile.ZipFile(docx_path) as docx, docx.open("word/document.xml") as xml:
+        for _, p in etree.iterparse(xml, events=("end",), tag=W_P):
+            body = p.getparent()
+            if body.tag != W_BODY:
+                # paragraphs in tables and text boxes are skipped, as with doc.paragraphs
+                continue
+            parts = []
+            for run in p.iterchildren(W_R, W_HYPERLINK):
+                for r in (run.iterchildren(W_R) if run.tag == W_HYPERLINK else (run,)):
+                    for child in r.iterchildren(*RUN_TEXT_TAGS):
+                        text = RUN_TEXT_TAGS[child.tag]
+                        parts.append((child.text or "") if text is None else text)
+            yield "".join(parts)
+            # free this paragraph and everything parsed before it
+            p.clear()
+            while p.getprevious() is not None:
+                del body[0]
+
+def parse_docx(docx_path: Path, include_open: bool = False):
     """
     Returns list of dicts:
     [{'qnum': optional int, 'text': str, 'choices': [{'text': str, 'ok': bool}], 'multi': bool}]
     Supports inline ✅ markers and/or a trailing Key table.
+    Questions without options are left out unless include_open is set.
     """
-    doc = Document(str(docx_path))
-    lines = []
-    for p in doc.paragraphs:
-        txt = p.text
-        if txt and txt.strip():
-            lines.append(txt)
-
-    # Try to capture a key table if present
-    key_map = extract_key_table(lines)
-
-    # State machine: accumulate a question until next question starts
+    # State machine: accumulate a question until next question starts.
+    # Paragraphs are read once; after the 'Калит'/'Key' heading they are
+    # answer key pairs like '1  Г' or '1) Г'.
     items = []
     cur = None
     q_order_counter = 0
+    key_map = {}
+    mode = "qa"
 
     def commit_current():
         nonlocal cur, items
-        if cur and clean_text(cur.get("text", "")):
-            # If no explicit correctness and have key_map + qnum, mark by key
-            opts = cur.get("choices", [])
-            if opts:
-                # If no any ok marked:
-                if not any(o.get("ok") for o in opts) and cur.get("qnum") and key_map.get(cur["qnum"]):
-                    key = key_map[cur["qnum"]]
-                    # Find option by A/B/C/D order
-                    # We assume options were appended in order A..Z
-                    idx_map = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4}
-                    if key in idx_map and idx_map[key] < len(opts):
-                        opts[idx_map[key]]["ok"] = True
-            # detect multi if >=2 ok
-            ok_count = sum(1 for o in cur.get("choices", []) if o.get("ok"))
-            cur["multi"] = ok_count > 1
-            items.append(cur)
+        if cur:
+            # question text is collected as parts and joined once
+            cur["text"] = clean_text(" ".join(cur.pop("text_parts")))
+            if cur["text"] and (cur["choices"] or include_open):
+                items.append(cur)
         cur = None
 
-    for raw in lines:
+    for raw in iter_paragraph_text(docx_path):
+        if not raw or not raw.strip():
+            continue
+
+        if mode == "key":
+            for m in KEY_PAIR_PAT.finditer(raw.strip()):
+                key_map[int(m.group(1))] = normalize_option_key(m.group(2))
+            continue
+
         line = clean_text(raw)
         if not line:
             continue
 
         # Skip entire key block lines from becoming questions
-        if re.search(r"\b(Калит|Ключ|Key)\b", line, re.IGNORECASE):
-            # Commit current and break further parsing of Q/A
+        if KEY_HEADER_PAT.search(line):
+            # Commit current and switch to reading the key
             commit_current()
-            break
+            mode = "key"
+            continue
 
         # New question?
         qnum = None
         qtxt = None
-        m = QUESTION_NUM_PREFIX.match(line)
+        m = QUESTION_NUM_PREFIX.match(line) if line[0].isdigit() else None
         if m:
             qnum = int(m.group(1))
             qtxt = clean_text(m.group(2))
 
-        if is_question_line(line) or qnum is not None:
+        if qnum is not None or is_question_line(line):
             # start new question
             commit_current()
             q_order_counter += 1
             cur = {
                 "qnum": qnum,
-                "text": qtxt if qtxt else line,
+                "text_parts": [qtxt if qtxt else line],
                 "choices": []
             }
             continue
 
-        # Option?
-        om = OPTION_PREFIX_PAT.match(line)
-        if om and cur is not None:
+        # Option? ✅ marks a correct one
+        has_check = "✅" in line
+        prefix_len = option_prefix_len(line)
+        if prefix_len and cur is not None:
             # Strip prefix
-            key = normalize_option_key(om.group(1))
-            body = clean_text(line[om.end():])
-            ok = "✅" in line
-            # Remove ✅ from text
-            body = body.replace("✅", "").strip()
-            cur["choices"].append({"text": body, "ok": ok})
+            key = normalize_option_key(line[0])
+            body = clean_text(line[prefix_len:])
+            if has_check:
+                # Remove ✅ from text
+                body = body.replace("✅", "").strip()
+            cur["choices"].append({"text": body, "ok": has_check})
             continue
 
         # Bulleted option without A/B etc, but with ✅
-        if cur is not None and ("✅" in line or re.match(r"^[•\-–]\s+", line)):
-            text = line.replace("✅", "").lstrip("•-–").strip()
-            ok = "✅" in line
-            cur["choices"].append({"text": text, "ok": ok})
+        if cur is not None and (has_check or BULLET_PAT.match(line)):
+            text = line.replace("✅", "") if has_check else line
+            cur["choices"].append({"text": text.lstrip("•-–").strip(), "ok": has_check})
             continue
 
         # Fallback: if we have a current question but line is continuation, append to question text
-        if cur is not None and not OPTION_PREFIX_PAT.match(line):
+        if cur is not None and not prefix_len:
             # join long question text
-            cur["text"] = (cur["text"] + " " + line).strip()
+            cur["text_parts"].append(line)
 
     # commit last
     commit_current()
+    apply_key_map(items, key_map)
     return items
 
 
@@ -187,6 +234,7 @@ class Command(BaseCommand):
         survey_id = opts["survey_id"]
         lang = opts["language"]
         points = opts["points"]
+        only_single = opts["only_single"]
         paths = [Path(p) for p in opts["files"]]
 
         try:
@@ -200,6 +248,21 @@ class Command(BaseCommand):
             if p.suffix.lower() != ".docx":
                 raise CommandError(f"Unsupported file type (need .docx): {p}")
 
+        # DOCX files are independent and parsing is CPU-bound, so several files
+        # are parsed in worker processes; the transaction only covers the writes
+        if len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+                parsed = list(executor.map(parse_docx, paths))
+        else:
+            parsed = [parse_docx(p) for p in paths]
+
+        for p, items in zip(paths, parsed):
+            self.stdout.write(f"Parsed {len(items)} questions from {p.name}")
+
+        # parsed items with options (open questions are skipped for now);
+        # ORM objects are built only once parsing is done
+        pending_items = list(chain.from_iterable(parsed))
+
         with transaction.atomic():
             if opts["reset"]:
                 # careful with unique_together (survey, order)
@@ -207,77 +270,40 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING("Existing questions deleted."))
 
             # figure next order start
-            next_order = (survey.questions.aggregate_max("order") or 0) if hasattr(survey.questions, "aggregate_max") else 0
-            if not next_order:
-                try:
-                    next_order = survey.questions.order_by("-order").first().order + 1
-                except Exception:
-                    next_order = 1
-
-            total_q = 0
-            total_c = 0
-
-            for p in paths:
-                items = parse_docx(p)
-                self.stdout.write(f"Parsed {len(items)} questions from {p.name}")
-
-                for idx, it in enumerate(items, start=1):
-                    qtext = it["text"]
-                    choices = it.get("choices", [])
-
-                    if not qtext or not choices:
-                        # Skip open questions for now (no options)
-                        continue
-
-                    qtype = "multiple" if (not opts["only-single"] and sum(1 for c in choices if c.get("ok")) > 1) else "single"
-
-                    q = Question(
-                        survey=survey,
-                        question_type=qtype,
-                        points=points,
-                        order=next_order,
-                        is_active=True,
-                    )
-                    # set language-specific text
-                    if lang == "uz":
-                        q.text_uz = qtext
-                        q.text_uz_cyrl = ""
-                        q.text_ru = ""
-                    elif lang == "uz-cyrl":
-                        q.text_uz_cyrl = qtext
-                        q.text_uz = ""
-                        q.text_ru = ""
-                    else:
-                        q.text_ru = qtext
-                        q.text_uz = ""
-                        q.text_uz_cyrl = ""
-
-                    q.save()
-                    total_q += 1
-
-                    # create choices
-                    for n, ch in enumerate(choices, start=1):
-                        c = Choice(
-                            question=q,
-                            is_correct=bool(ch.get("ok")),
-                            order=n
-                        )
-                        if lang == "uz":
-                            c.text_uz = ch["text"]
-                            c.text_uz_cyrl = ""
-                            c.text_ru = ""
-                        elif lang == "uz-cyrl":
-                            c.text_uz_cyrl = ch["text"]
-                            c.text_uz = ""
-                            c.text_ru = ""
-                        else:
-                            c.text_ru = ch["text"]
-                            c.text_uz = ""
-                            c.text_uz_cyrl = ""
-                        c.save()
-                        total_c += 1
-
-                    next_order += 1
+            next_order = (survey.questions.aggregate(Max("order"))["order__max"] or 0) + 1
+
+            # the language is fixed per run: fill its text field, leave the others empty
+            text_field, *other_fields = LANG_FIELDS[lang]
+            empty_texts = dict.fromkeys(other_fields, "")
+
+            questions = [
+                Question(
+                    survey=survey,
+                    question_type="multiple" if (not only_single and it["multi"]) else "single",
+                    points=points,
+                    order=next_order + i,
+                    is_active=True,
+                    **{text_field: it["text"], **empty_texts},
+                )
+                for i, it in enumerate(pending_items)
+            ]
+            # Postgres returns the primary keys, so choices can reference the saved questions
+            Question.objects.bulk_create(questions, batch_size=500)
+
+            choices = [
+                Choice(
+                    question_id=q.pk,
+                    is_correct=ch["ok"],
+                    order=n,
+                    **{text_field: ch["text"], **empty_texts},
+                )
+                for q, it in zip(questions, pending_items)
+                for n, ch in enumerate(it["choices"], start=1)
+            ]
+            Choice.objects.bulk_create(choices, batch_size=2000)
+
+            total_q = len(questions)
+            total_c = len(choices)
 
             self.stdout.write(self.style.SUCCESS(
                 f"Imported {total_q} questions and {total_c} choices into Survey(id={survey_id})."
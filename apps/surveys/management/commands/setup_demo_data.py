@@ -3,6 +3,43 @@ from django.core.management import call_command
 from django.db import transaction
 
 
+# Справка выводится одним вызовом write: текст статичен
+USAGE_INFO = '\n'.join([
+    '\n📖 Как использовать систему:',
+    '-' * 30,
+    '\n🔐 Авторизация:',
+    '• Модератор: +998901000000 / moderator123',
+    '• Пользователи: +99890100XXXX / user123',
+    '  (где XXXX от 1000 до количества созданных пользователей)',
+    '\n🌐 API Endpoints:',
+    '• Отправка OTP: POST /api/auth/send-otp/',
+    '• Авторизация: POST /api/auth/login/',
+    '• Список опросов: GET /api/surveys/',
+    '• Запуск опроса: POST /api/surveys/{id}/start/',
+    '\n👨‍💼 Панель модератора:',
+    '• Dashboard: GET /api/moderator/dashboard/',
+    '• Пользователи: GET /api/moderator/users/',
+    '• Статистика: GET /api/moderator/surveys/',
+    '\n🐳 Docker команды:',
+    '• Запуск: docker-compose -f docker-compose.local.yml up -d',
+    '• Логи: docker-compose -f docker-compose.local.yml logs django',
+    '• Shell: docker-compose -f docker-compose.local.yml exec django python manage.py shell',
+    '\n📱 Тестирование:',
+    '• Система работает на http://localhost:8000',
+    '• API документация: http://localhost:8000/api/',
+    '• Админка: http://localhost:8000/admin/',
+    '\n🎯 Созданные опросы:',
+    '• "Тест по основам программирования" - 5 вопросов',
+    '• "Тест по математике" - 4 вопроса',
+    '• "Общие знания" - 4 вопроса',
+    '\n💡 Полезные команды:',
+    '• Только пользователи: python manage.py create_test_users --count 20',
+    '• Только опросы: python manage.py create_test_surveys --survey-type programming',
+    '• Очистить всё: python manage.py setup_demo_data --clear-all',
+    '\n' + '=' * 60,
+])
+
+
 class Command(BaseCommand):
     help = 'Настраивает полную демонстрационную систему с пользователями и опросами'
 
@@ -84,46 +121,7 @@ class Command(BaseCommand):
 
     def display_usage_info(self):
         """Выводит информацию о том, как использовать систему."""
-        self.stdout.write('\n📖 Как использовать систему:')
-        self.stdout.write('-' * 30)
-        
-        self.stdout.write('\n🔐 Авторизация:')
-        self.stdout.write('• Модератор: +998901000000 / moderator123')
-        self.stdout.write('• Пользователи: +99890100XXXX / user123')
-        self.stdout.write('  (где XXXX от 1000 до количества созданных пользователей)')
-
-        self.stdout.write('\n🌐 API Endpoints:')
-        self.stdout.write('• Отправка OTP: POST /api/auth/send-otp/')
-        self.stdout.write('• Авторизация: POST /api/auth/login/')
-        self.stdout.write('• Список опросов: GET /api/surveys/')
-        self.stdout.write('• Запуск опроса: POST /api/surveys/{id}/start/')
-        
-        self.stdout.write('\n👨‍💼 Панель модератора:')
-        self.stdout.write('• Dashboard: GET /api/moderator/dashboard/')
-        self.stdout.write('• Пользователи: GET /api/moderator/users/')
-        self.stdout.write('• Статистика: GET /api/moderator/surveys/')
-
-        self.stdout.write('\n🐳 Docker команды:')
-        self.stdout.write('• Запуск: docker-compose -f docker-compose.local.yml up -d')
-        self.stdout.write('• Логи: docker-compose -f docker-compose.local.yml logs django')
-        self.stdout.write('• Shell: docker-compose -f docker-compose.local.yml exec django python manage.py shell')
-
-        self.stdout.write('\n📱 Тестирование:')
-        self.stdout.write('• Система работает на http://localhost:8000')
-        self.stdout.write('• API документация: http://localhost:8000/api/')
-        self.stdout.write('• Админка: http://localhost:8000/admin/')
-
-        self.stdout.write('\n🎯 Созданные опросы:')
-        self.stdout.write('• "Тест по основам программирования" - 5 вопросов')
-        self.stdout.write('• "Тест по математике" - 4 вопроса') 
-        self.stdout.write('• "Общие знания" - 4 вопроса')
-
-        self.stdout.write('\n💡 Полезные команды:')
-        self.stdout.write('• Только пользователи: python manage.py create_test_users --count 20')
-        self.stdout.write('• Только опросы: python manage.py create_test_surveys --survey-type programming')
-        self.stdout.write('• Очистить всё: python manage.py setup_demo_data --clear-all')
-
-        self.stdout.write('\n' + '=' * 60)
+        self.stdout.write(USAGE_INFO)
         self.stdout.write(
             self.style.WARNING('⚠️  Это демонстрационные данные! Не используйте в продакшене.')
         )
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.11 on 2026-10-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0012_sendreplaylistfile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='surveysession',
+            index=models.Index(condition=models.Q(('score__isnull', False)), fields=['user', '-score', '-completed_at'], name='sess_user_best_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.11 on 2026-10-16 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0013_surveysession_sess_user_best_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='faceverification',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Timestamp'),
+        ),
+    ]
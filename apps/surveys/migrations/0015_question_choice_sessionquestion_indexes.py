@@ -0,0 +1,29 @@
+# Generated by Django 5.1.11 on 2026-10-16 15:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('surveys', '0014_alter_faceverification_timestamp'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='question',
+            index=models.Index(fields=['survey', 'is_active'], name='question_survey_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='choice',
+            index=models.Index(fields=['question', 'is_correct'], name='choice_question_correct_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sessionquestion',
+            index=models.Index(fields=['session', 'is_answered', 'order'], name='sessq_session_answered_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import uuid
@@ -8,6 +9,33 @@ import random
 from datetime import timedelta
 from apps.contrib.constants import UserWorkDomainChoices, EmployeeLevelChoices, QuestionCategoryChoices
 
+# Active question counts are also cleared whenever questions are written,
+# see QuestionQuerySet and the Question signals
+ACTIVE_QUESTIONS_COUNT_CACHE_TIMEOUT = 60 * 5
+
+
+def sample_ids_by_category(rows, size):
+    """
+    Reservoir-sample up to `size` ids per category from (id, category) rows
+    in a single pass (Algorithm R).
+
+    Returns ({category: shuffled ids}, {category: number of rows seen}).
+    """
+    reservoirs = {}
+    seen = {}
+    for pk, category in rows:
+        n = seen.get(category, 0)
+        seen[category] = n + 1
+        if n < size:
+            reservoirs.setdefault(category, []).append(pk)
+        else:
+            j = random.randrange(n + 1)
+            if j < size:
+                reservoirs[category][j] = pk
+    for ids in reservoirs.values():
+        random.shuffle(ids)
+    return reservoirs, seen
+
 
 class Survey(models.Model):
     """Model for surveys/tests."""
@@ -86,57 +114,76 @@ class Survey(models.Model):
                 models.Q(work_domain=user_work_domain) | models.Q(work_domain='')
             )
         
-        # If we have fewer questions than requested, use all available
-        total_available = all_questions.count()
+        # Stream the pool's ids and categories once, keeping at most `count`
+        # random ids per category in memory
+        reservoirs, pool_sizes = sample_ids_by_category(
+            all_questions.values_list('id', 'category').iterator(chunk_size=2000), count
+        )
+        total_available = sum(pool_sizes.values())
         if total_available == 0:
             return []
         
+        # If we have fewer questions than requested, use all available
         actual_count = min(count, total_available)
         
         # Calculate questions per category based on percentages
         safety_logic_psychology_count = int(actual_count * self.safety_logic_psychology_percentage / 100)
         other_count = actual_count - safety_logic_psychology_count
         
-        # Get questions by category
-        safety_logic_psychology_questions = all_questions.filter(
-            category=QuestionCategoryChoices.SAFETY_LOGIC_PSYCHOLOGY
-        )
-        other_questions = all_questions.filter(
-            category=QuestionCategoryChoices.OTHER
-        )
-        
-        selected_questions = []
-        
-        # Select questions from Safety, Logic, Psychology category FIRST
-        if safety_logic_psychology_count > 0 and safety_logic_psychology_questions.exists():
-            available_safety_count = min(safety_logic_psychology_count, safety_logic_psychology_questions.count())
-            safety_question_ids = list(safety_logic_psychology_questions.values_list('id', flat=True))
-            selected_safety_ids = random.sample(safety_question_ids, available_safety_count)
-            selected_questions.extend(safety_logic_psychology_questions.filter(id__in=selected_safety_ids))
-        
-        # Select questions from Other category SECOND
-        if other_count > 0 and other_questions.exists():
-            available_other_count = min(other_count, other_questions.count())
-            other_question_ids = list(other_questions.values_list('id', flat=True))
-            selected_other_ids = random.sample(other_question_ids, available_other_count)
-            selected_questions.extend(other_questions.filter(id__in=selected_other_ids))
+        # Select questions from Safety, Logic, Psychology category FIRST, then Other.
+        # Reservoirs are shuffled, so their prefixes are random samples
+        safety_logic_psychology_ids = reservoirs.get(QuestionCategoryChoices.SAFETY_LOGIC_PSYCHOLOGY, [])
+        other_ids = reservoirs.get(QuestionCategoryChoices.OTHER, [])
+        selected_groups = [
+            safety_logic_psychology_ids[:safety_logic_psychology_count],
+            other_ids[:other_count],
+        ]
         
         # If we don't have enough questions from categories, fill with remaining questions
-        if len(selected_questions) < actual_count:
-            remaining_count = actual_count - len(selected_questions)
-            remaining_questions = all_questions.exclude(id__in=[q.id for q in selected_questions])
-            if remaining_questions.exists():
-                remaining_question_ids = list(remaining_questions.values_list('id', flat=True))
-                selected_remaining_ids = random.sample(remaining_question_ids, min(remaining_count, len(remaining_question_ids)))
-                selected_questions.extend(remaining_questions.filter(id__in=selected_remaining_ids))
+        selected_count = sum(len(ids) for ids in selected_groups)
+        if selected_count < actual_count:
+            taken = {
+                QuestionCategoryChoices.SAFETY_LOGIC_PSYCHOLOGY: len(selected_groups[0]),
+                QuestionCategoryChoices.OTHER: len(selected_groups[1]),
+            }
+            remaining = {category: size - taken.get(category, 0) for category, size in pool_sizes.items()}
+            fill_ids = []
+            fill_count = actual_count - selected_count
+            while len(fill_ids) < fill_count:
+                # Weighting by unselected pool size keeps the fill-up uniform over all remaining questions
+                category = random.choices(list(remaining), weights=list(remaining.values()))[0]
+                fill_ids.append(reservoirs[category][taken.get(category, 0)])
+                taken[category] = taken.get(category, 0) + 1
+                remaining[category] -= 1
+            selected_groups.append(fill_ids)
         
-        # Return questions in order: Safety/Logic/Psychology first, then Other
+        # Fetch the selected questions in one query and return them in order:
+        # Safety/Logic/Psychology first, then Other, then the fill-up questions.
         # No shuffling to maintain the order
+        group_of = {pk: group for group, ids in enumerate(selected_groups) for pk in ids}
+        selected_questions = list(self.questions.filter(id__in=group_of))
+        selected_questions.sort(key=lambda question: group_of[question.id])
         return selected_questions
     
     def get_total_available_questions(self):
         """Get total number of available active questions."""
-        return self.questions.filter(is_active=True).count()
+        return cache.get_or_set(
+            Survey.active_questions_count_cache_key(self.pk),
+            lambda: self.questions.filter(is_active=True).count(),
+            ACTIVE_QUESTIONS_COUNT_CACHE_TIMEOUT
+        )
+    
+    @staticmethod
+    def active_questions_count_cache_key(survey_id):
+        """Cache key for the number of active questions of a survey."""
+        return f"survey_active_q_count:{survey_id}"
+    
+    @staticmethod
+    def clear_active_questions_count(survey_ids):
+        """Drop the cached active question counts of surveys once the transaction commits."""
+        keys = [Survey.active_questions_count_cache_key(survey_id) for survey_id in set(survey_ids)]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
     
     def clean(self):
         """Validate that percentage fields don't exceed 100%."""
@@ -180,6 +227,34 @@ class SurveyEmployeeLevelConfig(models.Model):
         return f"{self.survey.title} - {self.get_employee_level_display()} ({self.questions_count} questions)"
 
 
+class QuestionQuerySet(models.QuerySet):
+    """
+    Question queryset whose bulk writes clear the cached active question
+    counts, since they send no post_save signal.
+    """
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        Survey.clear_active_questions_count(question.survey_id for question in objs)
+        return objs
+    
+    def bulk_update(self, objs, *args, **kwargs):
+        objs = list(objs)
+        rows = super().bulk_update(objs, *args, **kwargs)
+        Survey.clear_active_questions_count(question.survey_id for question in objs)
+        return rows
+    
+    def update(self, **kwargs):
+        # Read the surveys before the update, which may move questions away
+        survey_ids = set(self.values_list('survey_id', flat=True))
+        rows = super().update(**kwargs)
+        if 'survey' in kwargs or 'survey_id' in kwargs:
+            survey = kwargs.get('survey', kwargs.get('survey_id'))
+            survey_ids.add(getattr(survey, 'pk', survey))
+        Survey.clear_active_questions_count(survey_ids)
+        return rows
+
+
 class Question(models.Model):
     """Model for survey questions with multi-language support."""
     
@@ -225,20 +300,32 @@ class Question(models.Model):
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
     
+    objects = QuestionQuerySet.as_manager()
+    
+    # Text fields tried in order for each language, Uzbek Latin is the fallback
+    _LANG_FIELDS = {
+        'uz': ('text_uz',),
+        'uz-cyrl': ('text_uz_cyrl', 'text_uz'),
+        'ru': ('text_ru', 'text_uz'),
+    }
+    
     class Meta:
         verbose_name = _("Question")
         verbose_name_plural = _("Questions")
         ordering = ['survey', 'order']
         unique_together = ['survey', 'order']
+        indexes = [
+            # Active question pool of a survey
+            models.Index(fields=['survey', 'is_active'], name='question_survey_active_idx'),
+        ]
     
     def get_text(self, language='uz'):
         """Get question text based on language."""
-        language_map = {
-            'uz': self.text_uz,
-            'uz-cyrl': self.text_uz_cyrl or self.text_uz,
-            'ru': self.text_ru or self.text_uz,
-        }
-        return language_map.get(language, self.text_uz)
+        for field in self._LANG_FIELDS.get(language, ('text_uz',)):
+            value = getattr(self, field)
+            if value:
+                return value
+        return self.text_uz
     
     def __str__(self):
         return f"{self.survey.title} - Question {self.order}"
@@ -257,20 +344,30 @@ class Choice(models.Model):
     is_correct = models.BooleanField(_("Is Correct"), default=False)
     order = models.PositiveIntegerField(_("Order"), default=0)
     
+    # Text fields tried in order for each language, Uzbek Latin is the fallback
+    _LANG_FIELDS = {
+        'uz': ('text_uz',),
+        'uz-cyrl': ('text_uz_cyrl', 'text_uz'),
+        'ru': ('text_ru', 'text_uz'),
+    }
+    
     class Meta:
         verbose_name = _("Choice")
         verbose_name_plural = _("Choices")
         ordering = ['question', 'order']
         unique_together = ['question', 'order']
+        indexes = [
+            # Correct choices of a question when scoring answers
+            models.Index(fields=['question', 'is_correct'], name='choice_question_correct_idx'),
+        ]
     
     def get_text(self, language='uz'):
         """Get choice text based on language."""
-        language_map = {
-            'uz': self.text_uz,
-            'uz-cyrl': self.text_uz_cyrl or self.text_uz,
-            'ru': self.text_ru or self.text_uz,
-        }
-        return language_map.get(language, self.text_uz)
+        for field in self._LANG_FIELDS.get(language, ('text_uz',)):
+            value = getattr(self, field)
+            if value:
+                return value
+        return self.text_uz
     
     def __str__(self):
         return f"{self.question} - {self.text_uz[:50]}"
@@ -286,6 +383,7 @@ class SurveySession(models.Model):
         ('expired', _('Expired')),
         ('cancelled', _('Cancelled')),
     ]
+    ACTIVE_STATUSES = frozenset({'started', 'in_progress'})
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='survey_sessions')
@@ -350,6 +448,14 @@ class SurveySession(models.Model):
         verbose_name_plural = _("Survey Sessions")
         ordering = ['-started_at']
         unique_together = ['user', 'survey', 'attempt_number']
+        indexes = [
+            # Best scored session per user (certificate lookup)
+            models.Index(
+                fields=['user', '-score', '-completed_at'],
+                condition=models.Q(score__isnull=False),
+                name='sess_user_best_idx',
+            ),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
@@ -370,6 +476,32 @@ class SurveySession(models.Model):
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def with_full_questions(cls):
+        """
+        Sessions with their survey, user, ordered session questions, questions
+        and choices loaded up front. Views that render every question of a
+        session should start from this queryset to avoid per-question queries.
+        """
+        return cls.objects.select_related('survey', 'user').prefetch_related(
+            models.Prefetch(
+                'sessionquestion_set',
+                queryset=SessionQuestion.objects.select_related('question').prefetch_related(
+                    models.Prefetch('question__choices', queryset=Choice.objects.order_by('order'))
+                ).order_by('order')
+            )
+        )
+    
+    @staticmethod
+    def current_session_cache_key(user_id):
+        """Cache key for the user's serialized current session."""
+        return f"current_session:{user_id}"
+    
+    @staticmethod
+    def owner_cache_key(session_id):
+        """Cache key for the owner of a session, used by proctoring checks."""
+        return f"sess_owner:{session_id}"
+    
     def is_expired(self):
         """Check if session is expired."""
         return timezone.now() > self.expires_at and self.status not in ['completed', 'cancelled']
@@ -404,55 +536,60 @@ class SurveySession(models.Model):
         if not questions:
             questions = self.survey.questions.filter(is_active=True)[:questions_count or 30]
         
-        for i, question in enumerate(questions, 1):
-            SessionQuestion.objects.create(
-                session=self,
-                question=question,
-                order=i
-            )
+        session_questions = [
+            SessionQuestion(session=self, question=question, order=i)
+            for i, question in enumerate(questions, 1)
+        ]
+        SessionQuestion.objects.bulk_create(session_questions, batch_size=500)
+        
+        # The question set is fixed from here on, so store the maximum score
+        # once instead of summing question points at every scoring
+        self.total_points = sum(sq.question.points for sq in session_questions)
+        SurveySession.objects.filter(pk=self.pk).update(total_points=self.total_points)
+        # Neither write sends post_save, so clear the cached session here
+        cache.delete(SurveySession.current_session_cache_key(self.user_id))
     
     def get_next_unanswered_question(self):
         """Get the next unanswered question in the session."""
         return self.sessionquestion_set.filter(is_answered=False).order_by('order').first()
     
+    def _session_question_at(self, order):
+        """Get the session question at an order number, or None."""
+        return self.sessionquestion_set.filter(order=order).first()
+    
     def get_question_by_order(self, order):
         """Get question by specific order number."""
-        try:
-            return self.sessionquestion_set.get(order=order)
-        except SessionQuestion.DoesNotExist:
-            return None
+        return self._session_question_at(order)
     
     def get_previous_question(self, current_order):
         """Get the previous question in the session."""
         if current_order <= 1:
             return None
-        try:
-            return self.sessionquestion_set.get(order=current_order - 1)
-        except SessionQuestion.DoesNotExist:
-            return None
+        return self._session_question_at(current_order - 1)
     
     def get_next_question(self, current_order):
         """Get the next question in the session (answered or not)."""
-        try:
-            return self.sessionquestion_set.get(order=current_order + 1)
-        except SessionQuestion.DoesNotExist:
-            return None
+        return self._session_question_at(current_order + 1)
     
     def can_modify_answer(self, question_id):
         """Check if user can modify answer for specific question."""
-        try:
-            session_question = self.sessionquestion_set.get(question_id=question_id)
-            # Allow modification if session is still active and question was answered
-            return (self.status in ['started', 'in_progress'] and 
-                   not self.is_expired() and 
-                   session_question.is_answered)
-        except SessionQuestion.DoesNotExist:
+        # Allow modification if session is still active and question was answered;
+        # the status check runs first so finished sessions skip the query
+        if self.status not in self.ACTIVE_STATUSES or self.is_expired():
             return False
+        is_answered = self.sessionquestion_set.filter(
+            question_id=question_id
+        ).values_list('is_answered', flat=True).first()
+        return is_answered is True
     
     def get_current_progress(self):
         """Get current session progress."""
-        total_questions = self.sessionquestion_set.count()
-        answered_questions = self.sessionquestion_set.filter(is_answered=True).count()
+        counts = self.sessionquestion_set.aggregate(
+            total=models.Count('id'),
+            answered=models.Count('id', filter=models.Q(is_answered=True))
+        )
+        total_questions = counts['total']
+        answered_questions = counts['answered']
         
         return {
             'total_questions': total_questions,
@@ -466,8 +603,11 @@ class SurveySession(models.Model):
         if self.status != 'completed':
             return None
         
-        total_points = sum(sq.question.points for sq in self.sessionquestion_set.all())
-        earned_points = sum(answer.points_earned for answer in self.answers.all())
+        total_points = self.total_points
+        if total_points is None:
+            # Sessions initialized before total_points was stored at start
+            total_points = self.sessionquestion_set.aggregate(total=models.Sum('question__points'))['total'] or 0
+        earned_points = self.answers.aggregate(total=models.Sum('points_earned'))['total'] or 0
         
         if total_points > 0:
             percentage = (earned_points / total_points) * 100
@@ -475,7 +615,15 @@ class SurveySession(models.Model):
             self.total_points = total_points
             self.percentage = percentage
             self.is_passed = percentage >= self.survey.passing_score
-            self.save()
+            # Only the score columns change; callers have already saved the
+            # completed session, so skip a full save() and its signals
+            SurveySession.objects.filter(pk=self.pk).update(
+                score=self.score,
+                total_points=self.total_points,
+                percentage=self.percentage,
+                is_passed=self.is_passed
+            )
+            cache.delete(SurveySession.current_session_cache_key(self.user_id))
             
             return {
                 'score': earned_points,
@@ -523,7 +671,12 @@ class SessionQuestion(models.Model):
         verbose_name = _("Session Question")
         verbose_name_plural = _("Session Questions")
         ordering = ['session', 'order']
+        # Also serves as the (session_id, order) index for question navigation
         unique_together = ['session', 'order']
+        indexes = [
+            # Next unanswered question: range scan in order, then LIMIT 1
+            models.Index(fields=['session', 'is_answered', 'order'], name='sessq_session_answered_idx'),
+        ]
     
     def __str__(self):
         return f"{self.session} - Question {self.order}"
@@ -550,40 +703,61 @@ class Answer(models.Model):
     class Meta:
         verbose_name = _("Answer")
         verbose_name_plural = _("Answers")
+        # Also serves as the (session_id, question_id) index for answer lookups
         unique_together = ['session', 'question']
     
-    def calculate_score(self):
-        """Calculate score for this answer."""
-        if self.question.question_type == 'open':
+    def calculate_score(self, correct_ids=None, selected_ids=None):
+        """
+        Calculate score for this answer.
+
+        The ids of the question's correct choices and of the selected choices
+        can be passed in when already loaded (see calculate_scores_bulk).
+        """
+        question_type = self.question.question_type
+        if question_type == 'open':
             # Open questions need manual scoring
             return 0
         
-        if self.question.question_type == 'single':
-            # Single choice
-            correct_choices = self.question.choices.filter(is_correct=True)
-            selected_choices = self.selected_choices.all()
+        if question_type in ('single', 'multiple'):
+            # Compare plain id sets rather than model instances
+            if correct_ids is None:
+                correct_ids = set(self.question.choices.filter(is_correct=True).values_list('id', flat=True))
+            if selected_ids is None:
+                selected_ids = set(self.selected_choices.values_list('id', flat=True))
             
-            if len(selected_choices) == 1 and selected_choices[0] in correct_choices:
-                self.is_correct = True
-                self.points_earned = self.question.points
+            if question_type == 'single':
+                # Single choice
+                is_correct = len(selected_ids) == 1 and selected_ids <= correct_ids
             else:
-                self.is_correct = False
-                self.points_earned = 0
-        
-        elif self.question.question_type == 'multiple':
-            # Multiple choice
-            correct_choices = set(self.question.choices.filter(is_correct=True))
-            selected_choices = set(self.selected_choices.all())
+                # Multiple choice
+                is_correct = correct_ids == selected_ids
             
-            if correct_choices == selected_choices:
-                self.is_correct = True
-                self.points_earned = self.question.points
-            else:
-                self.is_correct = False
-                self.points_earned = 0
+            self.is_correct = is_correct
+            self.points_earned = self.question.points if is_correct else 0
         
         return self.points_earned
     
+    @classmethod
+    def calculate_scores_bulk(cls, session):
+        """Score every answer of a session with prefetched choices and one bulk update."""
+        answers = list(
+            session.answers.select_related('question').prefetch_related(
+                models.Prefetch(
+                    'question__choices',
+                    queryset=Choice.objects.filter(is_correct=True),
+                    to_attr='correct_choices'
+                ),
+                'selected_choices',
+            )
+        )
+        for answer in answers:
+            answer.calculate_score(
+                correct_ids={choice.id for choice in answer.question.correct_choices},
+                selected_ids={choice.id for choice in answer.selected_choices.all()},
+            )
+        cls.objects.bulk_update(answers, ['is_correct', 'points_earned'], batch_size=500)
+        return answers
+    
     def __str__(self):
         return f"{self.session.user.name} - {self.question}"
 
@@ -618,7 +792,8 @@ class FaceVerification(models.Model):
     """Model for storing face verifications during survey sessions."""
     
     session = models.ForeignKey(SurveySession, on_delete=models.CASCADE, related_name='face_verifications')
-    timestamp = models.DateTimeField(_("Timestamp"), auto_now_add=True)
+    # Set explicitly when heartbeats are flushed from the write-behind buffer
+    timestamp = models.DateTimeField(_("Timestamp"), default=timezone.now)
     
     # Verification results
     face_detected = models.BooleanField(_("Face Detected"), default=False)
@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Question
+from .models import SessionQuestion
+from .models import Survey
+from .models import SurveySession
+
+
+def delete_on_commit(key):
+    """
+    Delete a cache key once the current transaction commits.
+
+    Deleting earlier would let a concurrent request cache the pre-commit
+    state again until the key expires.
+    """
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver([post_save, post_delete], sender=SurveySession)
+def clear_current_session_cache(sender, instance, **kwargs):
+    """Drop the cached current session when one of the user's sessions changes."""
+    delete_on_commit(SurveySession.current_session_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=SessionQuestion)
+def clear_current_session_cache_on_answer(sender, instance, **kwargs):
+    """Drop the cached current session when its progress changes."""
+    delete_on_commit(SurveySession.current_session_cache_key(instance.session.user_id))
+
+
+@receiver(post_delete, sender=SurveySession)
+def clear_session_owner_cache(sender, instance, **kwargs):
+    """Drop the cached owner of a deleted session."""
+    delete_on_commit(SurveySession.owner_cache_key(instance.id))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def clear_active_questions_count_cache(sender, instance, **kwargs):
+    """Drop the cached active question count of the question's survey."""
+    delete_on_commit(Survey.active_questions_count_cache_key(instance.survey_id))
@@ -1,12 +1,16 @@
 from celery import shared_task
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from pathlib import Path
 import subprocess
 import logging
+import requests
 
-from .models import SurveySession
+from . import heartbeat_buffer
+from .models import FaceVerification, SurveySession
 
 logger = logging.getLogger(__name__)
 
@@ -216,3 +220,118 @@ def create_hls_playlist(session_id):
         'total_chunks': chunks.count(),
         'total_duration': total_duration
     }
+
+
+def certificate_pdf_path(session_id, completed_at):
+    """
+    Storage path of a session's rendered certificate PDF.
+    
+    The completion time is part of the path, like the certificate cache key,
+    so a re-completed session gets a new PDF instead of the stale one.
+    """
+    version = int(completed_at.timestamp()) if completed_at else 0
+    return f'certificates/{session_id}_{version}.pdf'
+
+
+@shared_task()
+def generate_certificate_pdf(session_id):
+    """
+    Render the certificate of a completed session to PDF and store it.
+    
+    Runs the Gotenberg conversion outside the request/response cycle so web
+    workers are not blocked while Chromium renders the page.
+    
+    Args:
+        session_id: UUID of the survey session
+        
+    Returns:
+        dict with status and storage path of the PDF
+    """
+    from .gotenberg_client import convert_url_to_pdf, get_certificate_url
+    
+    try:
+        session = SurveySession.objects.get(id=session_id)
+    except SurveySession.DoesNotExist:
+        return {'status': 'error', 'message': 'Session not found'}
+    
+    if session.status != 'completed':
+        return {'status': 'error', 'message': 'Session is not completed'}
+    
+    pdf_path = certificate_pdf_path(session_id, session.completed_at)
+    if default_storage.exists(pdf_path):
+        return {'status': 'exists', 'path': pdf_path}
+    
+    try:
+        response = convert_url_to_pdf(get_certificate_url(session_id))
+    except requests.exceptions.RequestException as e:
+        logger.error(f'Error generating certificate PDF for session {session_id}: {str(e)}')
+        return {'status': 'error', 'message': 'Error generating PDF'}
+    
+    saved_path = default_storage.save(pdf_path, ContentFile(response.content))
+    logger.info(f'Certificate PDF for session {session_id} saved to {saved_path}')
+    
+    return {'status': 'success', 'path': saved_path}
+
+
+@shared_task()
+def flush_face_verifications():
+    """
+    Persist buffered proctoring heartbeats with batched inserts.
+    
+    Heartbeats are pushed to Redis by the proctoring API and written to
+    Postgres here, so active sessions do not cost one INSERT each.
+    
+    Returns:
+        dict with status and number of stored verifications
+    """
+    created = 0
+    
+    while True:
+        entries = heartbeat_buffer.pop_batch()
+        if not entries:
+            break
+        
+        # Sessions may have been deleted while their heartbeats were buffered
+        session_ids = {entry['session_id'] for entry in entries}
+        existing_ids = {
+            str(session_id) for session_id in
+            SurveySession.objects.filter(id__in=session_ids).values_list('id', flat=True)
+        }
+        
+        verifications = []
+        for entry in entries:
+            if entry['session_id'] not in existing_ids:
+                continue
+            # A malformed entry is dropped on its own instead of failing the batch
+            try:
+                timestamp = parse_datetime(entry['timestamp'])
+                if timestamp is None:
+                    raise ValueError('invalid timestamp')
+                confidence_score = entry['confidence_score']
+                verifications.append(FaceVerification(
+                    session_id=entry['session_id'],
+                    timestamp=timestamp,
+                    face_detected=bool(entry['face_detected']),
+                    face_count=int(entry['face_count']),
+                    confidence_score=float(confidence_score) if confidence_score is not None else None,
+                    looking_at_screen=bool(entry['looking_at_screen']),
+                    mobile_device_detected=bool(entry['mobile_device_detected'])
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f'Skipping malformed face verification entry {entry!r}: {str(e)}')
+        
+        try:
+            FaceVerification.objects.bulk_create(verifications, batch_size=500)
+        except Exception:
+            # The batch was already removed from Redis; put it back for the next run
+            heartbeat_buffer.requeue(entries)
+            raise
+        created += len(verifications)
+        
+        if len(entries) < heartbeat_buffer.FLUSH_BATCH_SIZE:
+            break
+    
+    if created:
+        logger.info(f'Flushed {created} buffered face verifications')
+    
+    return {'status': 'success', 'created': created}
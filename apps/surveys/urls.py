@@ -1,8 +1,11 @@
 from django.urls import path
 from .api.views import (
     DownloadCertificatePDFView, 
+    GenerateCertificatePDFView,
+    CertificatePDFJobView,
     GetCertificateDataView,
     DownloadUserCertificatePDFView,
+    GenerateUserCertificatePDFView,
     GetUserCertificateDataView
 )
 app_name = 'surveys'
@@ -12,7 +15,12 @@ urlpatterns = [
     path('certificate/<str:session_id>/download/', DownloadCertificatePDFView.as_view(), name='download-certificate'),
     path('certificate/<str:session_id>/data/', GetCertificateDataView.as_view(), name='certificate-data'),
     
+    # Background PDF generation
+    path('certificate/<str:session_id>/generate/', GenerateCertificatePDFView.as_view(), name='generate-certificate'),
+    path('jobs/<str:task_id>/', CertificatePDFJobView.as_view(), name='certificate-job'),
+    
     # Certificate endpoints by user UUID
-    path('user/<str:user_uuid>/certificate/download/', DownloadUserCertificatePDFView.as_view(), name='download-user-certificate'),
-    path('user/<str:user_uuid>/certificate/data/', GetUserCertificateDataView.as_view(), name='user-certificate-data'),
+    path('user/<int:user_uuid>/certificate/download/', DownloadUserCertificatePDFView.as_view(), name='download-user-certificate'),
+    path('user/<int:user_uuid>/certificate/data/', GetUserCertificateDataView.as_view(), name='user-certificate-data'),
+    path('user/<int:user_uuid>/certificate/generate/', GenerateUserCertificatePDFView.as_view(), name='generate-user-certificate'),
 ]
\ No newline at end of file
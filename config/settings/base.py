@@ -310,6 +310,13 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-schedule
+CELERY_BEAT_SCHEDULE = {
+    "flush-face-verifications": {
+        "task": "apps.surveys.tasks.flush_face_verifications",
+        "schedule": 10.0,
+    },
+}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
 CELERY_WORKER_SEND_TASK_EVENTS = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#std-setting-task_send_sent_event
@@ -442,5 +449,12 @@ C1_BASIC_TOKEN = env("C1_BASIC_TOKEN", default="")
 # ------------------------------------------------------------------------------
 BASE_URL = env("BASE_URL", default="http://localhost:8000")
 
+# Certificate PDF rendering (Gotenberg)
+# ------------------------------------------------------------------------------
+# CSS selector the frontend certificate page sets once it has rendered, e.g.
+# "[data-certificate-ready]". Leave empty until the frontend ships the marker;
+# Gotenberg then waits a fixed delay instead.
+CERTIFICATE_READY_SELECTOR = env("CERTIFICATE_READY_SELECTOR", default="")
+
 # Your stuff...
 # ------------------------------------------------------------------------------